@@ -4,6 +4,7 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 
 from alembic import context
 
@@ -19,8 +20,9 @@ from app.config import settings
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-if config.config_file_name is not None:
+# This line sets up loggers basically. Skipped when the app runs the migrations
+# at startup (app.database.run_migrations), which has configured logging already.
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # Set the SQLAlchemy URL in the alembic.ini file
@@ -80,7 +82,7 @@ def run_migrations_online() -> None:
 
         with context.begin_transaction():
             # Create the pgvector extension if it doesn't exist
-            connection.execute("CREATE EXTENSION IF NOT EXISTS vector")
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
             context.run_migrations()
 
 
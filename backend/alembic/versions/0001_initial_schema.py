@@ -0,0 +1,70 @@
+"""Initial schema: presentations, slide metadata and slide shapes
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-03-10 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+
+    op.create_table(
+        "presentations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String()),
+        sa.Column("storage_path", sa.String()),
+        sa.Column("number_of_slides", sa.Integer()),
+        sa.Column("image_path", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_presentations_id", "presentations", ["id"])
+
+    op.create_table(
+        "slide_metadata",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("slide_number", sa.Integer()),
+        sa.Column("presentation_id", sa.Integer(), sa.ForeignKey("presentations.id")),
+        sa.Column("title", sa.String()),
+        sa.Column("category", sa.String()),
+        sa.Column("slide_type", sa.String()),
+        sa.Column("purpose", sa.String()),
+        sa.Column("tags", sa.JSON()),
+        sa.Column("audience", sa.String()),
+        sa.Column("sales_stage", sa.String()),
+        sa.Column("embedding", Vector(1536)),
+        sa.Column("image_path", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("content_mapping", sa.JSON()),
+    )
+    op.create_index("ix_slide_metadata_id", "slide_metadata", ["id"])
+
+    op.create_table(
+        "slide_shapes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("slide_metadata_id", sa.Integer(), sa.ForeignKey("slide_metadata.id"), nullable=False),
+        sa.Column("shape_index", sa.Integer(), nullable=False),
+        sa.Column("shape_type", sa.String(), nullable=False),
+        sa.Column("text_content", sa.String(), nullable=True),
+    )
+    op.create_index("ix_slide_shapes_id", "slide_shapes", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("slide_shapes")
+    op.drop_table("slide_metadata")
+    op.drop_table("presentations")
@@ -0,0 +1,45 @@
+"""Full-text search vector over slide titles and shape text
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("slide_metadata", sa.Column("search_vector", postgresql.TSVECTOR()))
+    op.create_index(
+        "ix_slide_metadata_search_vector",
+        "slide_metadata",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+    # Backfill existing slides, same expression as app.utils.slide_search.refresh_search_vectors
+    op.execute("""
+        UPDATE slide_metadata
+        SET search_vector =
+            setweight(to_tsvector('english', coalesce(slide_metadata.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(slide_shapes.text_content, ' ')
+                FROM slide_shapes
+                WHERE slide_shapes.slide_metadata_id = slide_metadata.id
+            ), '')), 'B')
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_slide_metadata_search_vector", table_name="slide_metadata")
+    op.drop_column("slide_metadata", "search_vector")
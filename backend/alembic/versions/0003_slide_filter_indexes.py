@@ -0,0 +1,52 @@
+"""Indexes for slide search filters; tags stored as JSONB
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FILTER_COLUMNS = ["presentation_id", "category", "slide_type", "audience", "sales_stage"]
+
+
+def upgrade() -> None:
+    # JSON has no containment operator or GIN support, JSONB has both
+    op.alter_column(
+        "slide_metadata",
+        "tags",
+        type_=postgresql.JSONB(),
+        postgresql_using="tags::jsonb",
+    )
+    op.create_index(
+        "ix_slide_metadata_tags",
+        "slide_metadata",
+        ["tags"],
+        postgresql_using="gin",
+        postgresql_ops={"tags": "jsonb_path_ops"},
+    )
+    for column in FILTER_COLUMNS:
+        op.create_index(f"ix_slide_metadata_{column}", "slide_metadata", [column])
+
+
+def downgrade() -> None:
+    for column in FILTER_COLUMNS:
+        op.drop_index(f"ix_slide_metadata_{column}", table_name="slide_metadata")
+    op.drop_index("ix_slide_metadata_tags", table_name="slide_metadata")
+    op.alter_column(
+        "slide_metadata",
+        "tags",
+        type_=sa.JSON(),
+        postgresql_using="tags::json",
+    )
@@ -0,0 +1,47 @@
+"""Half-precision HNSW index over slide embeddings for first-stage matching
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def upgrade() -> None:
+    # halfvec needs pgvector 0.7; update the extension if the server ships a newer version
+    op.execute("ALTER EXTENSION vector UPDATE")
+    version = op.get_bind().execute(
+        sa.text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    ).scalar()
+    if tuple(int(part) for part in version.split(".")[:2]) < (0, 7):
+        logger.warning(
+            "pgvector %s has no halfvec type, skipping the half-precision index; "
+            "matching keeps using exact float32 distances", version
+        )
+        return
+
+    # The float32 column stays the source of truth for exact re-ranking. The index
+    # converts every existing embedding to half precision and is half the size of a
+    # float32 HNSW index.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_slide_metadata_embedding_halfvec ON slide_metadata "
+        "USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_slide_metadata_embedding_halfvec")
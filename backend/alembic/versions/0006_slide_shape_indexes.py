@@ -0,0 +1,31 @@
+"""Index slide shapes by slide
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Also serves lookups by slide_metadata_id alone: shape loads, cascade deletes and the
+    # search vector's shape text subquery
+    op.create_index(
+        "ix_slide_shapes_slide_metadata_id_shape_index",
+        "slide_shapes",
+        ["slide_metadata_id", "shape_index"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_slide_shapes_slide_metadata_id_shape_index", table_name="slide_shapes")
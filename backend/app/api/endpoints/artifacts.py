@@ -0,0 +1,75 @@
+import mimetypes
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from app.utils.artifact_store import ARTIFACT_PREFIXES
+from app.utils.storage import storage, verify_artifact_signature
+
+router = APIRouter()
+
+# Slide images are served at the application root, where image_path values point
+images_router = APIRouter()
+
+
+def storage_response(
+    key: str,
+    request: Optional[Request] = None,
+    filename: Optional[str] = None,
+    media_type: Optional[str] = None
+) -> StreamingResponse:
+    """Stream a blob from the storage backend, honouring a single HTTP Range header"""
+    stored = storage.stat(key)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    headers = {"Accept-Ranges": "bytes"}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    media_type = media_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+    range_header = request.headers.get("range") if request else None
+    if not range_header:
+        headers["Content-Length"] = str(stored.size)
+        return StreamingResponse(storage.iter_read(key), media_type=media_type, headers=headers)
+
+    try:
+        unit, _, byte_range = range_header.partition("=")
+        start_text, _, end_text = byte_range.partition("-")
+        if unit.strip() != "bytes" or "," in byte_range:
+            raise ValueError(range_header)
+        if start_text:
+            start = int(start_text)
+            end = min(int(end_text), stored.size - 1) if end_text else stored.size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(stored.size - int(end_text), 0)
+            end = stored.size - 1
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid Range header: {range_header}")
+
+    if start > end or start >= stored.size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{stored.size}"}
+        )
+
+    headers["Content-Range"] = f"bytes {start}-{end}/{stored.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(storage.iter_read(key, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+@images_router.get("/images/{filename}")
+async def get_image(filename: str, request: Request):
+    """Serve a rendered slide image from the storage backend"""
+    return storage_response(f"{ARTIFACT_PREFIXES['images']}/{filename}", request)
+
+
+@router.get("/artifacts/{key:path}")
+async def get_artifact(key: str, expires: int, signature: str, request: Request):
+    """Serve any stored artifact through a presigned-style URL (see StorageBackend.presigned_url)"""
+    if not verify_artifact_signature(key, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired artifact URL")
+    return storage_response(key, request)
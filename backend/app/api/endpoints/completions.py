@@ -1,157 +1,199 @@
-from collections import defaultdict
-import os
+import json
+import re
 import shutil
+import zipfile
+from typing import List, Literal, Tuple
 from app.schemas import schemas
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.database  import get_db
-from app.models.models import PresentationMetadata, SlideShape
-from app.utils.pptx_construction import generate_presentation_outline, generate_slide_content_remix, construct_presentation_remix, find_matching_slides_remix
-from pathlib import Path
+from app.utils.generation_pipeline import build_presentation, build_presentation_batch
+from app.utils.previews import read_preview_manifest, schedule_previews
 from datetime import datetime
 import logging
-import json
-from fastapi.responses import FileResponse
-
-# Set up logging
-log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
+from pptx import Presentation
+from app.api.endpoints.artifacts import storage_response
+from app.config import settings
+from app.utils.artifact_store import ARTIFACT_PREFIXES, store_file
+from app.utils.blocking import run_blocking
+from app.utils.deadline import Deadline, DeadlineExceeded, deadline_var
+from app.utils.result_cache import presentation_cache, presentation_cache_key, repository_version
+from app.utils.storage import spooled_file, storage
+from app.utils.structured_logging import log_payload
 
-# Create a logger for this module
 logger = logging.getLogger("presentation_generation")
-logger.setLevel(logging.DEBUG)
-
-# Create handlers
-file_handler = logging.FileHandler(log_dir / "presentation_generation.log")
-file_handler.setLevel(logging.DEBUG)
-
-# Create formatters and add it to handlers
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-
-# Add handlers to the logger
-logger.addHandler(file_handler)
 
 router = APIRouter()
 
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.-]+")
+
 @router.post("/completions/generate-presentation")
 async def generate_presentation(
     input_data: schemas.PresentationInput,
+    request_timeout: float | None = Header(None, alias="X-Request-Timeout"),
+    previews: bool = Query(False),
     db: Session = Depends(get_db)
 ):
-    """Generate a complete presentation based on input requirements"""
+    """
+    Generate a complete presentation based on input requirements. Generation is bounded by
+    GENERATION_DEADLINE_SECONDS, or the X-Request-Timeout header (in seconds) if shorter;
+    slides that could not be rewritten in time keep their original text and their positions
+    are listed in the X-Degraded-Slides response header. With previews=true, slide thumbnails
+    are rendered in the background and listed at the URL in the X-Preview-Url header.
+    """
     
-    logger.info(f"Starting presentation generation for {input_data.title}")
-    logger.debug(f"Input data: {json.dumps(input_data.model_dump(), indent=2)}")
+    logger.info("Starting presentation generation for %s", input_data.title)
+    log_payload(logger, "Input data", input_data)
+
+    timeout = settings.GENERATION_DEADLINE_SECONDS
+    if request_timeout is not None and request_timeout > 0:
+        timeout = min(timeout, request_timeout)
+    deadline_token = deadline_var.set(Deadline.after(timeout))
     
     try:
-        # 1. Generate presentation outline
-        logger.info("Generating presentation outline...")
-        outline = await generate_presentation_outline(input_data)
-        logger.debug(f"Generated outline: {json.dumps([o.model_dump() for o in outline], indent=2)}")
-        
-        # 2. Find matching slides from repository
-        logger.info("Finding matching slides...")
-
-        matched_slides_n_ids = await find_matching_slides_remix(outline, db)
-        matched_slides = [matched_slide for matched_slide, _ in matched_slides_n_ids] #Just the slides (SlideMetadata objects)
-        
-        original_project = db.query(PresentationMetadata).filter(PresentationMetadata.id == matched_slides[0].presentation_id).first()
-        path_of_original_project = original_project.storage_path
-
-        slide_metadata_ids = [slide.id for slide in matched_slides]  # Extract all slide IDs
-
-        if slide_metadata_ids: 
-            original_slides_content = (
-            db.query(SlideShape.slide_metadata_id, SlideShape.shape_type, SlideShape.text_content)
-            .filter(SlideShape.slide_metadata_id.in_(slide_metadata_ids))
-            .all()
-)
+        if settings.RESULT_CACHE_ENABLED:
+            cache_key = presentation_cache_key(input_data, repository_version(db))
+            result = await presentation_cache.get_or_create(
+                cache_key,
+                lambda: build_presentation(input_data, db)
+            )
         else:
-            original_slides_content = []  # Return an empty list if no matches
-        slides = defaultdict(lambda: {"slideNumber": None, "text": {}})
-
-        for index, (slide_number, shape_type, text) in enumerate(original_slides_content, start=1):
-            if text.strip():  # Remove empty strings
-                slides[slide_number]["slideNumber"] = slide_number
-                slides[slide_number]["text"][f"section{index}"] = text  
-
-        # Convert defaultdict to a regular dictionary
-        slides = list(slides.values())
-        logger.info(f'Original slides content: {original_slides_content}')
-        logger.debug(f"Found {len(matched_slides)} matching slides")
-        logger.debug(f"Matched slides: {[{'id': s.id, 'title': s.title, 'type': s.slide_type} for s in matched_slides]}")
-        
-        # 3. Generate content for selected slides
-        logger.info("Generating slide content...")
-        slide_content = await generate_slide_content_remix(slides, outline, input_data )
-        logger.debug(f"Generated content: {json.dumps(slide_content, indent=2)}")
-        
-        # 4. Create output directory if it doesn't exist
-        output_dir = Path("presentation_output")
-        output_dir.mkdir(exist_ok=True)
+            result = await build_presentation(input_data, db)
 
-        # 5. Generate output path
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = output_dir / f"presentation_{timestamp}.pptx"
-        logger.info(f"Will save presentation to: {output_path}")
-        
-        # 6. Get template path from first slide's presentation
-        template_presentation = db.query(PresentationMetadata).filter(
-            PresentationMetadata.id == matched_slides[0].presentation_id
-        ).first()
-        logger.debug(f"Using template from: {template_presentation.storage_path}")
-        
-        # 7. Construct the final presentation
-        logger.info("Constructing final presentation...")
-        result = construct_presentation_remix(
-            path_of_original_project,
-            output_path=str(output_path),
-            slide_data=slide_content
-        )
-        logger.info(f"Presentation result {result}")
-        
         # return the file with appropriate headers
-        return FileResponse(
-            path=str(result),
+        response = storage_response(
+            result.artifact_key,
             filename=f"{input_data.title.replace(' ', '_')}.pptx",
             media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation"
         )
-        
+        if result.degraded_slides:
+            response.headers["X-Degraded-Slides"] = ",".join(map(str, result.degraded_slides))
+        if previews:
+            await schedule_previews(result)
+            response.headers["X-Preview-Url"] = _preview_url(result.artifact_key)
+        return response
+
+    except DeadlineExceeded as e:
+        logger.error("Presentation generation timed out: %s", e)
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        logger.error(f"Error generating presentation: {str(e)}", exc_info=True)
+        logger.error("Error generating presentation: %s", e, exc_info=True)
         raise
-    
+    finally:
+        deadline_var.reset(deadline_token)
 
-@router.post("/duplicate-pptx/")
-async def process_pptx():
-    file_path = Path("slides_repository")
-    duplication_interval = 2
+
+def _zip_presentations(entries: List[Tuple[str, str]], manifest: List[dict]) -> str:
+    """Store (filename, artifact key) entries and a manifest.json as one zip artifact"""
+    with spooled_file(".zip") as output_path:
+        # Decks are already compressed
+        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_STORED) as archive:
+            for filename, key in entries:
+                with archive.open(filename, "w") as member:
+                    for chunk in storage.iter_read(key):
+                        member.write(chunk)
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        return store_file("outputs", output_path, prefix="batch_", suffix=".zip")
+
+
+@router.post("/completions/generate-presentations/batch", response_model=schemas.PresentationBatchResult)
+async def generate_presentation_batch(
+    batch: schemas.PresentationBatchInput,
+    delivery: Literal["links", "zip"] = Query("links"),
+    previews: bool = Query(False),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate many presentations at once, e.g. client variants of the same pitch. Outline
+    sections shared by several items are embedded and matched once, each template is read
+    once, and rewrites run under the process-wide BATCH_LLM_CONCURRENCY limit. The batch is
+    bounded by BATCH_DEADLINE_SECONDS; an item that fails is reported without failing the others.
+    With delivery=links each item links to its artifact, with delivery=zip the decks and a
+    manifest.json are returned as a single zip. previews=true also starts rendering each
+    deck's thumbnails and adds their preview_url to the items.
+    """
+    if len(batch.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_ITEMS} presentations can be generated at once"
+        )
+    logger.info("Starting batch generation of %d presentations", len(batch.items))
+
+    deadline_token = deadline_var.set(Deadline.after(settings.BATCH_DEADLINE_SECONDS))
     try:
-        # Find the first PPTX file in the source directory
-        source_files = list(file_path.glob("*.pptx"))
-        if not source_files:
-            raise HTTPException(status_code=404, detail=f"No PPTX files found in {file_path}")
-        
-        source_file = source_files[0]
-        logger.info(f"Processing file: {source_file}")
-        
-        output_dir = Path("presentation_output")
-        output_dir.mkdir(exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"duplicated_{timestamp}.pptx"
-        output_path = output_dir / output_filename
-        
+        results = await build_presentation_batch(batch.items, db)
+    finally:
+        deadline_var.reset(deadline_token)
+
+    items = []
+    for index, (input_data, result) in enumerate(zip(batch.items, results)):
+        item = schemas.PresentationBatchItem(index=index, title=input_data.title, status="ok")
+        if isinstance(result, Exception):
+            if not isinstance(result, (DeadlineExceeded, ValueError)):
+                logger.error("Error generating presentation %d of the batch: %s", index, result, exc_info=result)
+            item.status = "error"
+            item.error = str(result) if isinstance(result, (DeadlineExceeded, ValueError)) else "Generation failed"
+        else:
+            item.artifact_key = result.artifact_key
+            item.artifact_url = storage.presigned_url(result.artifact_key)
+            item.degraded_slides = result.degraded_slides
+            if previews:
+                await schedule_previews(result)
+                item.preview_url = _preview_url(result.artifact_key)
+        items.append(item)
+    logger.info("Batch generated %d of %d presentations", sum(item.status == "ok" for item in items), len(items))
+
+    if delivery == "links":
+        return schemas.PresentationBatchResult(items=items)
+
+    entries = [
+        (f"{item.index + 1:02d}_{_UNSAFE_FILENAME_CHARS.sub('_', item.title)}.pptx", item.artifact_key)
+        for item in items if item.artifact_key
+    ]
+    manifest = [item.model_dump(exclude={"artifact_key", "artifact_url", "preview_url"}) for item in items]
+    archive_key = await run_blocking(_zip_presentations, entries, manifest)
+    return storage_response(archive_key, filename="presentations.zip", media_type="application/zip")
+
+
+def _preview_url(artifact_key: str) -> str:
+    return f"{settings.API_PREFIX}/completions/previews/{artifact_key}"
+
+
+@router.get("/completions/previews/{artifact_key:path}")
+async def get_presentation_previews(artifact_key: str):
+    """
+    The previews of a generated presentation: 202 while they are rendered, then the status
+    and, when ready, an artifact URL for each slide's thumbnail in deck order
+    """
+    manifest = read_preview_manifest(artifact_key)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No previews for this presentation")
+    if manifest["status"] == "pending":
+        return JSONResponse(status_code=202, content=manifest)
+
+    for slide in manifest.get("slides", []):
+        slide["url"] = storage.presigned_url(slide.pop("image_key"))
+    return manifest
+
+
+@router.get("/completions/cache/stats")
+async def get_presentation_cache_stats():
+    """Hit ratio and single-flight statistics of the generated presentation cache"""
+    return presentation_cache.stats()
+
+
+def _keep_every_nth_slide(source_file: str, duplication_interval: int) -> str:
+    with storage.local_copy(source_file) as source_path, spooled_file(".pptx") as output_path:
         # First, copy the entire file
-        shutil.copy2(source_file, output_path)
+        shutil.copy2(source_path, output_path)
         
         # Open the copied file and modify it
         prs = Presentation(output_path)
         
         # Create list of slide indices to keep (only every other slide)
         slides_to_keep = list(range(0, len(prs.slides), duplication_interval))
-        logger.info(f"Keeping slides at indices: {slides_to_keep}")
+        logger.info("Keeping slides at indices: %s", slides_to_keep)
         
         # Remove slides that aren't in our keep list
         # We need to remove from end to start to avoid index shifting
@@ -161,13 +203,33 @@ async def process_pptx():
                 xml_slides.remove(xml_slides[i])
         
         prs.save(output_path)
+        return store_file("outputs", output_path, prefix="duplicated_", suffix=".pptx")
+
+
+@router.post("/duplicate-pptx/")
+async def process_pptx():
+    decks_prefix = ARTIFACT_PREFIXES["decks"]
+    duplication_interval = 2
+    try:
+        # Find the first PPTX file in the deck storage
+        source_files = [blob.key for blob in storage.list(decks_prefix) if blob.key.endswith(".pptx")]
+        if not source_files:
+            raise HTTPException(status_code=404, detail=f"No PPTX files found in {decks_prefix}")
+        
+        source_file = source_files[0]
+        logger.info("Processing file: %s", source_file)
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_filename = f"duplicated_{timestamp}.pptx"
+        
+        result = await run_blocking(_keep_every_nth_slide, source_file, duplication_interval)
         
-        return FileResponse(
-            path=str(output_path),
+        return storage_response(
+            result,
             filename=output_filename,
             media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation"
         )
     
     except Exception as e:
-        logger.error(f"Error processing PPTX: {str(e)}", exc_info=True)
+        logger.error("Error processing PPTX: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing PPTX: {str(e)}")
\ No newline at end of file
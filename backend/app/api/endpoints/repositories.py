@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Form, UploadFile, File, Depends
+from fastapi import APIRouter, Form, HTTPException, Query, UploadFile, File, Depends
 from sqlalchemy.orm import Session
 from typing import List
+from app.config import settings
 from app.schemas import schemas
 from app.database import get_db
-from app.utils.pptx_parsing import process_powerpoint_repository, retrieve_shape_and_content
+from app.utils.artifact_store import UploadTooLargeError
+from app.utils.blocking import run_blocking
+from app.utils.pptx_parsing import process_powerpoint_repository, retrieve_shape_and_content, sync_powerpoint_repository
 from app.models.models import PresentationMetadata
+from app.utils.metrics import observe_stage
+from app.utils.slide_rendering import prefetch_neighbours, render_slides
+from app.utils.slide_search import refresh_search_vectors
 
 router = APIRouter()
 
@@ -16,11 +22,14 @@ async def upload_repository(
 ):
     """Upload a PowerPoint file to create/update the slide repository and presentation metadata as well as the slide metadata, embedding of metadata, and content schema"""
 
-    storage_path, slide_metadata_objects, image_paths = await process_powerpoint_repository(
-        file.file, 
-        db, 
-        source_type="upload"
-    )
+    try:
+        storage_path, slide_metadata_objects, image_paths = await process_powerpoint_repository(
+            file.file, 
+            db, 
+            source_type="upload"
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
     # Create presentation metadata
     presentation_title = title or "Untitled Slide Repository"
@@ -37,12 +46,19 @@ async def upload_repository(
     for metadata in slide_metadata_objects:
         metadata.presentation_id = presentation.id
         db.add(metadata)
+    db.flush()
 
-    shapes_and_content = retrieve_shape_and_content(storage_path)
+    shapes_and_content = await run_blocking(
+        retrieve_shape_and_content,
+        storage_path,
+        [metadata.id for metadata in slide_metadata_objects]
+    )
     db.add_all(shapes_and_content)
     db.flush()
+    refresh_search_vectors(db, [metadata.id for metadata in slide_metadata_objects])
     
-    db.commit()
+    with observe_stage("db_commit"):
+        db.commit()
 
 
     
@@ -64,6 +80,37 @@ async def get_repositories(
 
 
 
+@router.post("/repository/{presentation_id}/render")
+async def render_repository_slides(
+    presentation_id: int,
+    first: int = Query(..., ge=1),
+    last: int | None = Query(None, ge=1),
+    db: Session = Depends(get_db)
+):
+    """
+    Render slides first..last (or just first) of a presentation that have no image yet, as
+    left by LAZY_SLIDE_RENDERING, and return the image paths of the range. Neighbouring
+    slides are rendered in the background.
+    """
+    last = last or first
+    if last < first:
+        raise HTTPException(status_code=400, detail="last must not be before first")
+    if last - first + 1 > settings.RENDER_MAX_SLIDES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.RENDER_MAX_SLIDES} slides can be rendered at once")
+
+    presentation = db.query(PresentationMetadata).filter(PresentationMetadata.id == presentation_id).first()
+    if presentation is None:
+        raise HTTPException(status_code=404, detail=f"Presentation {presentation_id} not found")
+
+    image_paths = await render_slides(db, presentation, list(range(first, last + 1)))
+    if not image_paths:
+        raise HTTPException(status_code=404, detail=f"Presentation {presentation_id} has no slides {first} to {last}")
+    prefetch_neighbours(presentation, first, last)
+
+    return {"presentation_id": presentation.id, "image_paths": image_paths}
+
+
+
 # @router.get("/repository/metadata/{presentation_id}", response_model=schemas.PresentationMetadata)
 # async def get_repository_metadata(
 #     presentation_id: int,
@@ -75,11 +122,25 @@ async def get_repositories(
 
 
 
-# @router.post("/repository/sync")
-# async def sync_slide_repository(
-#     file_id: str,
-#     db: Session = Depends(get_db)
-# ):
-#     """Sync with the PowerPoint file in Microsoft 365"""
-    # result = await utils.slide_repository.sync_repository(file_id, db)
-    # return result
\ No newline at end of file
+@router.post("/repository/sync")
+async def sync_slide_repository(
+    presentation_id: int = Form(...),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """Sync an existing presentation with a new version of its PowerPoint file, reprocessing only the slides that changed"""
+    presentation = db.query(PresentationMetadata).filter(PresentationMetadata.id == presentation_id).first()
+    if presentation is None:
+        raise HTTPException(status_code=404, detail=f"Presentation {presentation_id} not found")
+
+    try:
+        diff = await sync_powerpoint_repository(presentation, file.file, db, source_type="upload")
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    return {
+        "message": f"{len(diff['changed']) + len(diff['added'])} slides reprocessed, {len(diff['removed'])} removed",
+        "storage_path": presentation.storage_path,
+        "presentation_id": presentation.id,
+        **diff
+    }
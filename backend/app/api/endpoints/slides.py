@@ -1,14 +1,126 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, defer
+from typing import List, Literal
+from app.config import settings
 from app.schemas import schemas
 from app.database import get_db
 from app.models.models import PresentationMetadata, SlideMetadata
-from app.utils.openai import get_embedding
+from app.api.endpoints.artifacts import storage_response
+from app.utils.blocking import run_blocking
+from app.utils.embeddings import semantic_payload, semantic_text
+from app.utils.metrics import CACHE_EVENTS
+from app.utils.openai import get_cached_embedding, get_embedding, get_embeddings
+from app.utils.pptx_parsing import CONTENT_MAPPING_PROFILES, mapping_profile, slide_content_mapping
+from app.utils.slide_rendering import prefetch_neighbours, render_slides
+from app.utils.slide_search import refresh_search_vectors
+import base64
+import binascii
+import hashlib
 import json
+import math
 
 router = APIRouter()
 
+
+def _query_fingerprint(q: str | None) -> str | None:
+    """Ties a cursor to the search it was issued for; None when slides are listed by id"""
+    return hashlib.sha256(q.encode()).hexdigest()[:16] if q else None
+
+
+def _encode_cursor(position: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def _decode_cursor(cursor: str, q: str | None) -> dict:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        position["id"] = int(position["id"])
+        if position.get("query") != _query_fingerprint(q):
+            raise ValueError("Cursor of another search")
+        if q:
+            position["distance"] = float(position["distance"])
+            if not math.isfinite(position["distance"]):
+                raise ValueError("Cursor distance is not finite")
+        return position
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Declared before /slides/{presentation_id} so "search" is not parsed as a presentation id
+@router.get("/slides/search", response_model=schemas.SlideSearchResponse)
+async def search_slides(
+    q: str | None = None,
+    category: str | None = None,
+    slide_type: str | None = None,
+    tags: List[str] | None = Query(None),
+    audience: str | None = None,
+    sales_stage: str | None = None,
+    presentation_id: int | None = None,
+    limit: int = Query(20, ge=1),
+    cursor: str | None = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Search slides across the whole library. With q, slides are ranked by embedding
+    similarity to it; otherwise they are listed by id. Filters are combined with AND and
+    tags must all be present. Pass next_cursor back as cursor for the next page.
+    """
+    limit = min(limit, settings.SEARCH_MAX_LIMIT)
+    query = db.query(SlideMetadata).options(
+        defer(SlideMetadata.embedding),
+        defer(SlideMetadata.search_vector),
+        defer(SlideMetadata.content_mapping)
+    )
+    for column, value in (
+        (SlideMetadata.category, category),
+        (SlideMetadata.slide_type, slide_type),
+        (SlideMetadata.audience, audience),
+        (SlideMetadata.sales_stage, sales_stage),
+        (SlideMetadata.presentation_id, presentation_id),
+    ):
+        if value is not None:
+            query = query.filter(column == value)
+    if tags:
+        query = query.filter(SlideMetadata.tags.contains(tags))
+
+    position = _decode_cursor(cursor, q) if cursor else None
+    if q:
+        distance = SlideMetadata.embedding.cosine_distance(await get_cached_embedding(q))
+        query = query.add_columns(distance).filter(SlideMetadata.embedding.isnot(None))
+        if position:
+            # Keyset pagination on (distance, id)
+            query = query.filter(or_(
+                distance > position["distance"],
+                and_(distance == position["distance"], SlideMetadata.id > position["id"])
+            ))
+        rows = query.order_by(distance, SlideMetadata.id).limit(limit + 1).all()
+    else:
+        if position:
+            query = query.filter(SlideMetadata.id > position["id"])
+        rows = [(slide, None) for slide in query.order_by(SlideMetadata.id).limit(limit + 1).all()]
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last_slide, last_distance = rows[-1]
+        next_cursor = _encode_cursor({"id": last_slide.id, "distance": last_distance, "query": _query_fingerprint(q)})
+
+    return schemas.SlideSearchResponse(
+        items=[
+            schemas.SlideSearchHit.model_validate({
+                'id': slide.id,
+                'slide_id': slide.id,
+                'score': None if slide_distance is None else 1 - slide_distance,
+                **slide.__dict__
+            })
+            for slide, slide_distance in rows
+        ],
+        next_cursor=next_cursor
+    )
+
+
 @router.get("/slides/{presentation_id}", response_model=List[schemas.SlideMetadata])
 async def get_slides(
     presentation_id: int,
@@ -24,6 +136,55 @@ async def get_slides(
 
 
 
+@router.get("/slides/{slide_metadata_id}/image")
+async def get_slide_image(
+    slide_metadata_id: int,
+    db: Session = Depends(get_db)
+):
+    """A slide's image, rendered on first request if ingestion left it without one (LAZY_SLIDE_RENDERING)"""
+    slide = db.query(SlideMetadata).filter(SlideMetadata.id == slide_metadata_id).first()
+    if slide is None:
+        raise HTTPException(status_code=404, detail="Slide not found")
+
+    image_path = slide.image_path
+    if not image_path:
+        image_path = (await render_slides(db, slide.presentation, [slide.slide_number]))[slide.slide_number]
+        prefetch_neighbours(slide.presentation, slide.slide_number, slide.slide_number)
+    return storage_response(image_path, media_type="image/jpeg")
+
+
+@router.get("/slides/{slide_metadata_id}/content-mapping")
+async def get_slide_content_mapping(
+    slide_metadata_id: int,
+    profile: Literal["minimal", "standard", "full"] = Query("full"),
+    db: Session = Depends(get_db)
+):
+    """
+    A slide's content_mapping with at least the detail of profile. Ingestion only extracts
+    CONTENT_MAPPING_PROFILE; a more detailed mapping is extracted from the stored deck when
+    asked for and stored in place of the cheaper one.
+    """
+    slide = db.query(SlideMetadata).filter(SlideMetadata.id == slide_metadata_id).first()
+    if slide is None:
+        raise HTTPException(status_code=404, detail="Slide not found")
+
+    stored = mapping_profile(slide.content_mapping)
+    if stored is not None and CONTENT_MAPPING_PROFILES.index(stored) >= CONTENT_MAPPING_PROFILES.index(profile):
+        CACHE_EVENTS.labels(cache="content_mapping", outcome="hit").inc()
+        return slide.content_mapping
+
+    CACHE_EVENTS.labels(cache="content_mapping", outcome="miss").inc()
+    try:
+        slide.content_mapping = await run_blocking(
+            slide_content_mapping, slide.presentation.storage_path, slide.slide_number, profile
+        )
+    except ValueError as e:
+        # The stored deck no longer has the slide
+        raise HTTPException(status_code=404, detail=str(e))
+    db.commit()
+    return slide.content_mapping
+
+
 @router.put("/slides/metadata/{slide_metadata_id}")
 async def update_slide_metadata(
     slide_metadata_id: int,
@@ -32,19 +193,63 @@ async def update_slide_metadata(
 ):
     """Update metadata for the specific slide"""
     slide = db.query(SlideMetadata).filter(SlideMetadata.id == slide_metadata_id).first()
+    previous_payload = semantic_payload(slide)
     for field, value in metadata.model_dump().items():
         setattr(slide, field, value)
     
-    # Update the embedding with the new metadata
-    semantic_content = {
-        "title": slide.title,
-        "purpose": slide.purpose,
-        "category": slide.category,
-        "tags": slide.tags,
-        "audience": slide.audience,
-        "sales_stage": slide.sales_stage
+    # Update the embedding only if the metadata it is computed from changed
+    if semantic_payload(slide) != previous_payload:
+        slide.embedding = await get_embedding(semantic_text(slide))
+        refresh_search_vectors(db, [slide.id])
+    db.commit()
+    return slide
+
+
+@router.patch("/slides/metadata", response_model=schemas.SlideMetadataBulkUpdateResult)
+async def bulk_update_slide_metadata(
+    request: schemas.SlideMetadataBulkUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    Update metadata for many slides in one transaction. Only the fields set on each
+    update are changed, and only slides whose embedded fields changed are re-embedded,
+    all with a single embeddings call.
+    """
+    if len(request.updates) > settings.SLIDE_BULK_UPDATE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SLIDE_BULK_UPDATE_MAX_ITEMS} slides can be updated at once"
+        )
+    ids = [update.id for update in request.updates]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Each slide can only appear once")
+
+    slides = {
+        slide.id: slide
+        for slide in db.query(SlideMetadata).options(defer(SlideMetadata.embedding)).filter(SlideMetadata.id.in_(ids))
     }
-    stringified_metadata = json.dumps(semantic_content)
-    slide.embedding = await get_embedding(stringified_metadata)
+    missing = [slide_id for slide_id in ids if slide_id not in slides]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Slides not found: {missing}")
+
+    changed = []
+    retitled = []
+    for update in request.updates:
+        slide = slides[update.id]
+        previous_payload = semantic_payload(slide)
+        for field, value in update.model_dump(exclude_unset=True, exclude={"id"}).items():
+            setattr(slide, field, value)
+        payload = semantic_payload(slide)
+        if payload != previous_payload:
+            changed.append(slide)
+            if payload["title"] != previous_payload["title"]:
+                retitled.append(slide.id)
+
+    if changed:
+        embeddings = await get_embeddings([semantic_text(slide) for slide in changed])
+        for slide, embedding in zip(changed, embeddings):
+            slide.embedding = embedding
+    # search_vector is built from the title and shape text
+    refresh_search_vectors(db, retitled)
     db.commit()
-    return slide
\ No newline at end of file
+    return schemas.SlideMetadataBulkUpdateResult(updated=ids, reembedded=[slide.id for slide in changed])
\ No newline at end of file
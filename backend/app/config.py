@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
 from dotenv import load_dotenv
@@ -12,6 +13,70 @@ class Settings(BaseSettings):
     DATABASE_URI: str = os.getenv("DATABASE_URI", "postgresql://postgres:postgres@db:5432/myapp")
     SECRET_KEY: str = os.getenv("SECRET_KEY", "default-secret-key")
     OPENAI_API_KEY: str = ""
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    EMBEDDING_DIMENSIONS: int = 1536  # Native dimensions of EMBEDDING_MODEL; after a cutover the migration's model and dimensions are used
+    EMBEDDING_MODEL_REFRESH_SECONDS: float = 5  # How often the API looks up the active embedding model in the background
+    EMBEDDING_BATCH_SIZE: int = 256  # Texts per embeddings API call when re-embedding in bulk
+    OUTLINE_MODEL: str = "gpt-4o-2024-08-06"  # Structured completions (presentation outline)
+    COMPLETION_MODEL: str = "gpt-3.5-turbo"  # Free-form completions (slide rewriting)
+    LLM_PROVIDER: str = "openai"  # "openai" or "fake" (app.utils.fake_openai, for offline load and performance tests)
+    OPENAI_BASE_URL: str = ""  # Overrides the OpenAI endpoint, e.g. for a proxy or an OpenAI-compatible server
+    FAKE_LLM_BASE_URL: str = "http://localhost:8100/v1"  # Where the fake server listens when LLM_PROVIDER=fake
+    FAKE_LLM_LATENCY_MS: float = 0  # Fixed latency added by the fake server to every call
+    FAKE_LLM_LATENCY_JITTER_MS: float = 0  # Extra uniformly distributed latency on top of FAKE_LLM_LATENCY_MS
+    FAKE_LLM_ERROR_RATE: float = 0  # Fraction of fake calls failing with 429/500/503
+    FAKE_LLM_SEED: int = 0  # Seeds the fake server's latency and error injection
+    FAKE_LLM_EMBEDDING_DIMENSIONS: int = 1536
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes read and hashed per chunk while storing uploads
+    MAX_UPLOAD_SIZE: int = 200 * 1024 * 1024  # Largest accepted PowerPoint file, in bytes
+    STORAGE_BACKEND: str = "local"  # "local" or "s3"
+    STORAGE_ROOT: str = "."  # Root directory of the local backend
+    STORAGE_SCRATCH_DIR: str = ""  # Local directory for temporary files, system default if empty
+    S3_BUCKET: str = "presentations"
+    S3_ENDPOINT_URL: str = ""  # e.g. http://minio:9000 for a MinIO stand-in
+    S3_REGION: str = ""
+    S3_ACCESS_KEY_ID: str = ""
+    S3_SECRET_ACCESS_KEY: str = ""
+    ARTIFACT_DISK_BUDGET: int = 10 * 1024 * 1024 * 1024  # Bytes the artifact store may use before evicting outputs
+    ARTIFACT_GC_INTERVAL_SECONDS: int = 600
+    ARTIFACT_GC_GRACE_SECONDS: int = 3600  # Unreferenced blobs younger than this may belong to an in-flight request
+    OUTPUT_TTL_SECONDS: int = 24 * 3600  # How long generated presentations are kept
+    RESULT_CACHE_ENABLED: bool = True  # Reuse generated presentations for identical requests
+    RESULT_CACHE_MAX_ENTRIES: int = 256
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 4096  # Query embeddings kept in memory by get_cached_embedding
+    SEARCH_MAX_LIMIT: int = 100  # Largest page size of /slides/search
+    DOCUMENT_WORKERS: int = 4  # Threads for python-pptx, file copies and LibreOffice; bounds that work in flight
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = 0.1  # How often the event-loop lag monitor samples
+    EVENT_LOOP_LAG_WINDOW_SECONDS: float = 60  # Window of event_loop_lag_max_seconds
+    EVENT_LOOP_LAG_WARN_SECONDS: float = 0.5  # Log a warning for stalls longer than this
+    LLM_HEDGING_ENABLED: bool = False  # Duplicate outline, rewrite and embedding calls slower than usual; first answer wins
+    LLM_HEDGE_PERCENTILE: float = 95  # Hedge once a call is slower than this percentile of recent calls
+    LLM_HEDGE_MAX_RATE: float = 0.05  # Largest fraction of calls that may be hedged
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Calls observed before hedging starts
+    LLM_HEDGE_WINDOW: int = 500  # Recent calls the percentile is taken over
+    GENERATION_DEADLINE_SECONDS: float = 90  # Longest a generation request may take; callers can ask for less with X-Request-Timeout
+    OUTLINE_BUDGET_SECONDS: float = 30
+    MATCHING_BUDGET_SECONDS: float = 20  # Section embeddings and slide matching
+    REWRITE_BUDGET_SECONDS: float = 45  # Slides not rewritten in time keep their original text
+    CONSTRUCTION_RESERVE_SECONDS: float = 10  # Time kept back from rewriting to assemble the deck
+    CONTENT_MAPPING_PROFILE: Literal["minimal", "standard", "full"] = "minimal"  # content_mapping detail extracted at ingestion
+    LAZY_SLIDE_RENDERING: bool = False  # Render slide images when first requested instead of at upload
+    RENDER_MAX_SLIDES: int = 10  # Most slides per on-demand render request
+    RENDER_PREFETCH_SLIDES: int = 2  # Neighbours on each side rendered in the background after an on-demand render
+    PREVIEW_WIDTH: int = 320  # Width in pixels of generated presentation previews
+    PREVIEW_PENDING_TIMEOUT_SECONDS: int = 600  # Previews still pending after this are considered failed (their node went away) and are retried
+    BATCH_MAX_ITEMS: int = 50  # Most presentations per POST /completions/generate-presentations/batch
+    BATCH_LLM_CONCURRENCY: int = 16  # Outline and rewrite calls of batch generation in flight, across all batches
+    BATCH_DEADLINE_SECONDS: float = 600  # Longest a batch request may take
+    REWRITE_PROMPT_TOKEN_BUDGET: int = 1500  # Prompt tokens per slide rewrite; optional context is trimmed to fit
+    SLIDE_BULK_UPDATE_MAX_ITEMS: int = 500  # Most slides per PATCH /slides/metadata, re-embedded in one API call
+    MATCH_CANDIDATE_LIMIT: int = 100  # Slides taken from each of the full-text and vector first stages per outline section
+    EMBEDDING_HALFVEC_SEARCH: bool = True  # First matching stage on the half-precision index when pgvector >= 0.7 provides it
+    MATCH_LEXICAL_WEIGHT: float = 0.3  # Weight of the full-text rank (0 to 1) added to embedding similarity when matching
+    LOG_LEVEL: str = ""  # Defaults to DEBUG when DEBUG is set, INFO otherwise
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_FILE: str = ""  # Also write logs to this file, e.g. logs/app.log
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.0  # Fraction of large-payload log calls (inputs, outlines, content) kept without DEBUG
 
     model_config = {
         "env_file": ".env",
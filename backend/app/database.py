@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -10,6 +12,27 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Directory holding alembic.ini and the alembic/ migrations
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Revision matching the schema Base.metadata.create_all used to build before migrations existed
+BASELINE_REVISION = "0001"
+
+def run_migrations():
+    """Upgrade the database schema to the latest Alembic revision"""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    config.attributes["configure_logger"] = False
+
+    inspector = inspect(engine)
+    if inspector.has_table("slide_metadata") and not inspector.has_table("alembic_version"):
+        # Database created by create_all before migrations existed
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
 def get_db():
     db = SessionLocal()
     try:
@@ -1,11 +1,20 @@
-from fastapi import FastAPI
+import asyncio
+import uuid
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy import text
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.config import settings
 from app.api import api_router
-from app.database import engine, Base
+from app.api.endpoints.artifacts import images_router
+from app.database import run_migrations
+from app.utils.artifact_store import run_garbage_collector
+from app.utils.blocking import monitor_event_loop_lag
+from app.utils.embedding_model import refresh_embedding_model, run_embedding_model_refresher
+from app.utils.structured_logging import configure_logging, request_id_var
+
+configure_logging()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -13,26 +22,56 @@ app = FastAPI(
     version="0.1.0",
 )
 
-app.mount("/images", StaticFiles(directory="images"), name="images")
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Degraded-Slides", "X-Preview-Url"],
 )
 
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Tag every log record emitted while handling a request with its id (X-Request-ID if the caller sent one)"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 app.include_router(api_router, prefix=settings.API_PREFIX)
+app.include_router(images_router, tags=["artifacts"])
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Liveness probe; runs on the event loop, so its latency also reflects event-loop stalls"""
+    return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics: pipeline stage latencies, LLM calls/tokens and cache outcomes"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.on_event("startup")
 def startup_db_client():
-    with engine.connect() as conn:
-        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-        conn.commit()
-    
-    from app.models.models import SlideMetadata, PresentationMetadata
-    Base.metadata.create_all(bind=engine)
+    run_migrations()
+    refresh_embedding_model()
+
+@app.on_event("startup")
+async def start_artifact_gc():
+    app.state.artifact_gc_task = asyncio.create_task(run_garbage_collector())
+
+@app.on_event("startup")
+async def start_embedding_model_refresher():
+    app.state.embedding_model_task = asyncio.create_task(run_embedding_model_refresher())
+
+@app.on_event("startup")
+async def start_event_loop_lag_monitor():
+    app.state.event_loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
 
 if __name__ == "__main__":
     import uvicorn
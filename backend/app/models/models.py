@@ -1,4 +1,5 @@
-from sqlalchemy import JSON, Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import JSON, Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -11,23 +12,29 @@ class SlideMetadata(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     slide_number = Column(Integer)
-    presentation_id = Column(Integer, ForeignKey("presentations.id"))
+    presentation_id = Column(Integer, ForeignKey("presentations.id"), index=True)
     title = Column(String)
-    category = Column(String) # i.e. "timelines"
-    slide_type = Column(String) #i.e. "gantt-chart"
+    category = Column(String, index=True) # i.e. "timelines"
+    slide_type = Column(String, index=True) #i.e. "gantt-chart"
     purpose = Column(String) # i.e. "to show the timeline of the project"
-    tags = Column(JSON)  # Array of strings
-    audience = Column(String) # i.e. "engineering team"
-    sales_stage = Column(String) # i.e. "discovery"
-    embedding = Column(Vector(1536))  # OpenAI embedding for semantic search
+    tags = Column(JSONB)  # Array of strings
+    audience = Column(String, index=True) # i.e. "engineering team"
+    sales_stage = Column(String, index=True) # i.e. "discovery"
+    embedding = Column(Vector())  # OpenAI embedding for semantic search, also indexed as halfvec (migration 0004); dimensions follow the active model, see app.utils.embedding_model
     image_path = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     content_mapping = Column(JSON)  # Defines structure for content replacement
+    search_vector = Column(TSVECTOR)  # Full-text index over title and shape text, see app.utils.slide_search
 
     presentation = relationship("PresentationMetadata", back_populates="slides")
     shapes = relationship("SlideShape", back_populates="slide_metadata", cascade="all, delete-orphan")  
 
+    __table_args__ = (
+        Index("ix_slide_metadata_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_slide_metadata_tags", "tags", postgresql_using="gin", postgresql_ops={"tags": "jsonb_path_ops"}),
+    )
+
 class PresentationMetadata(Base):
     __tablename__ = "presentations"
     
@@ -49,4 +56,23 @@ class SlideShape(Base):
     shape_type = Column(String, nullable=False)  # TEXT_BOX, AUTO_SHAPE, PICTURE, etc.
     text_content = Column(String, nullable=True)  # Extracted text from the shape
 
-    slide_metadata = relationship("SlideMetadata", back_populates="shapes")  
\ No newline at end of file
+    slide_metadata = relationship("SlideMetadata", back_populates="shapes")
+
+    __table_args__ = (
+        Index("ix_slide_shapes_slide_metadata_id_shape_index", "slide_metadata_id", "shape_index"),
+    )
+
+
+class EmbeddingMigration(Base):
+    """Progress of a re-embedding of all slides with a new model, see app.utils.embeddings"""
+    __tablename__ = "embedding_migrations"
+
+    id = Column(Integer, primary_key=True)
+    model = Column(String, nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    status = Column(String, nullable=False)  # "backfilling", "active" or "superseded"
+    last_slide_id = Column(Integer, nullable=False, server_default="0")  # Checkpoint: slides up to this id are done
+    processed = Column(Integer, nullable=False, server_default="0")
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    completed_at = Column(DateTime(timezone=True))
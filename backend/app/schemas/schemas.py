@@ -26,6 +26,27 @@ class SlideMetadataUpdate(SlideMetadataBase):
     class Config:
         exclude = {'content_mapping'}
 
+class SlideMetadataPatch(BaseModel):
+    """Semantic metadata only; content_mapping is extracted from the deck and cannot be patched"""
+    id: int  # Only the fields that are set are changed
+    title: Optional[str] = None
+    category: Optional[str] = None
+    slide_type: Optional[str] = None
+    purpose: Optional[str] = None
+    tags: Optional[List[str]] = None
+    audience: Optional[str] = None
+    sales_stage: Optional[str] = None
+
+    class Config:
+        extra = "forbid"
+
+class SlideMetadataBulkUpdate(BaseModel):
+    updates: List[SlideMetadataPatch]
+
+class SlideMetadataBulkUpdateResult(BaseModel):
+    updated: List[int]
+    reembedded: List[int]  # Slides whose title, purpose, category, tags, audience or sales stage changed
+
 class SlideMetadata(SlideMetadataBase):
     id: int
     slide_id: int
@@ -37,6 +58,13 @@ class SlideMetadata(SlideMetadataBase):
     class Config:
         from_attributes = True
 
+class SlideSearchHit(SlideMetadata):
+    score: Optional[float] = None  # Similarity to the query text, when one was given
+
+class SlideSearchResponse(BaseModel):
+    items: List[SlideSearchHit]
+    next_cursor: Optional[str] = None  # Pass as cursor to fetch the next page, None on the last page
+
 class SlideTemplate(BaseModel):
     id: int
     slide_id: str
@@ -91,6 +119,22 @@ class PresentationInput(BaseModel):
     tone: Optional[str] = None
     additional_context: Optional[str] = None
 
+class PresentationBatchInput(BaseModel):
+    items: List[PresentationInput] = Field(min_length=1)
+
+class PresentationBatchItem(BaseModel):
+    index: int  # Position in the request's items
+    title: str
+    status: str  # "ok" or "error"
+    artifact_key: str | None = None
+    artifact_url: str | None = None
+    degraded_slides: List[int] = Field(default_factory=list)
+    preview_url: str | None = None
+    error: str | None = None
+
+class PresentationBatchResult(BaseModel):
+    items: List[PresentationBatchItem]
+
 # For OpenAI response parsing
 class SlideOutlineBase(BaseModel):
     slide_number: int
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.models import PresentationMetadata, SlideMetadata
+from app.utils.storage import spooled_file, storage
+
+logger = logging.getLogger(__name__)
+
+# Every blob the application writes lives under one of these storage prefixes, named by its content hash
+ARTIFACT_PREFIXES: Dict[str, str] = {
+    "decks": "slides_repository",
+    "images": "images",
+    "outputs": "presentation_output",
+    "renders": "slide_renders",  # Deck PDFs cached for on-demand rendering, named after their deck
+    "previews": "presentation_previews",  # Thumbnails of generated presentations, kept like outputs
+}
+
+# Kinds that are not referenced by database rows but expire after OUTPUT_TTL_SECONDS
+GENERATED_KINDS = ("outputs", "previews")
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when a stored stream is larger than the allowed maximum size"""
+
+
+def artifact_key(kind: str, name: str) -> str:
+    return f"{ARTIFACT_PREFIXES[kind]}/{name}"
+
+
+def deck_render_key(deck_key: str) -> str:
+    """Where the PDF rendering of a stored deck is cached"""
+    return artifact_key("renders", f"{Path(deck_key).stem}.pdf")
+
+
+def rendered_deck_key(render_key: str) -> str:
+    return artifact_key("decks", f"{Path(render_key).stem}.pptx")
+
+
+def store_stream(
+    kind: str,
+    stream: BinaryIO,
+    prefix: str = "",
+    suffix: str = "",
+    max_size: Optional[int] = None
+) -> str:
+    """
+    Copy a stream into the store in fixed-size chunks, hashing it on the fly.
+    The blob is spooled to a local scratch file and only handed to the storage
+    backend under its content-addressed key once complete, so identical content
+    shares one blob. Returns the storage key.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with spooled_file(suffix) as temp_path:
+        with open(temp_path, "wb") as f:
+            while chunk := stream.read(settings.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLargeError(f"File exceeds the maximum size of {max_size} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Rewrite even if the blob exists, so a matching orphan gets a fresh grace period
+        key = artifact_key(kind, f"{prefix}{digest.hexdigest()}{suffix}")
+        storage.put_file(key, temp_path)
+
+    return key
+
+
+def store_file(kind: str, path: Path, prefix: str = "", suffix: str = "") -> str:
+    """Move a finished local file into the store under its content-addressed key"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(settings.UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+
+    key = artifact_key(kind, f"{prefix}{digest.hexdigest()}{suffix}")
+    storage.put_file(key, Path(path))
+    return key
+
+
+def artifact_references(db: Session) -> Counter:
+    """Count the database rows referencing each stored blob"""
+    references = Counter()
+    for column in (PresentationMetadata.storage_path, PresentationMetadata.image_path, SlideMetadata.image_path):
+        for (path,) in db.query(column).filter(column.isnot(None)):
+            references[os.path.normpath(path)] += 1
+    return references
+
+
+def collect_garbage(db: Session, now: Optional[float] = None) -> Dict[str, int]:
+    """
+    Remove blobs no database row references anymore (cached deck renders go with their
+    deck) and generated outputs and previews past their TTL, then evict the oldest of
+    those until the store fits in settings.ARTIFACT_DISK_BUDGET.
+    Blobs younger than settings.ARTIFACT_GC_GRACE_SECONDS are left alone, as they may
+    belong to an upload or generation that has not committed yet.
+    """
+    now = now or time.time()
+    references = artifact_references(db)
+    stats = {"removed": 0, "evicted": 0, "freed_bytes": 0, "total_bytes": 0}
+
+    outputs = []
+    for kind, prefix in ARTIFACT_PREFIXES.items():
+        for blob in storage.list(prefix):
+            age = now - blob.modified_at
+            if age < settings.ARTIFACT_GC_GRACE_SECONDS:
+                stats["total_bytes"] += blob.size
+                continue
+
+            if kind in GENERATED_KINDS:
+                expired = age > settings.OUTPUT_TTL_SECONDS
+            elif kind == "renders":
+                expired = references[os.path.normpath(rendered_deck_key(blob.key))] == 0
+            else:
+                expired = references[os.path.normpath(blob.key)] == 0
+
+            if expired:
+                storage.delete(blob.key)
+                stats["removed"] += 1
+                stats["freed_bytes"] += blob.size
+                continue
+
+            stats["total_bytes"] += blob.size
+            if kind in GENERATED_KINDS:
+                outputs.append((blob.modified_at, blob.size, blob.key))
+
+    # Referenced decks and images cannot go, so the budget is enforced on outputs and previews, oldest first
+    for _, size, key in sorted(outputs):
+        if stats["total_bytes"] <= settings.ARTIFACT_DISK_BUDGET:
+            break
+        storage.delete(key)
+        stats["evicted"] += 1
+        stats["freed_bytes"] += size
+        stats["total_bytes"] -= size
+
+    if stats["total_bytes"] > settings.ARTIFACT_DISK_BUDGET:
+        logger.warning(
+            "Artifact store uses %d bytes, above the %d byte budget, after collecting garbage",
+            stats["total_bytes"], settings.ARTIFACT_DISK_BUDGET
+        )
+    return stats
+
+
+def _collect_garbage_once() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return collect_garbage(db)
+    finally:
+        db.close()
+
+
+async def run_garbage_collector():
+    """Background task collecting artifact garbage every settings.ARTIFACT_GC_INTERVAL_SECONDS"""
+    while True:
+        try:
+            stats = await asyncio.to_thread(_collect_garbage_once)
+            logger.info("Artifact garbage collection finished: %s", stats)
+        except Exception:
+            logger.exception("Artifact garbage collection failed")
+        await asyncio.sleep(settings.ARTIFACT_GC_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    print(_collect_garbage_once())
@@ -0,0 +1,58 @@
+"""
+Keeping blocking work off the event loop.
+
+Document work (python-pptx loads and saves, file copies, LibreOffice and pdf2image)
+runs on a dedicated pool of DOCUMENT_WORKERS threads through run_blocking, so a large
+deck cannot stall every other request and the amount of such work in flight is bounded.
+The pool is separate from asyncio's default executor, which the artifact GC uses.
+
+monitor_event_loop_lag measures how late the loop wakes up from a short sleep and exports
+the worst stall of the last EVENT_LOOP_LAG_WINDOW_SECONDS, to catch new blocking calls.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Tuple, TypeVar
+
+from app.config import settings
+from app.utils.metrics import DOCUMENT_QUEUE_WAIT, EVENT_LOOP_LAG, EVENT_LOOP_LAG_MAX
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+document_executor = ThreadPoolExecutor(max_workers=settings.DOCUMENT_WORKERS, thread_name_prefix="document")
+
+
+async def run_blocking(func: Callable[..., R], *args, **kwargs) -> R:
+    """Run func on the document executor; log records it emits keep the request id"""
+    context = contextvars.copy_context()
+    submitted = time.perf_counter()
+
+    def run():
+        DOCUMENT_QUEUE_WAIT.observe(time.perf_counter() - submitted)
+        return context.run(func, *args, **kwargs)
+
+    return await asyncio.get_running_loop().run_in_executor(document_executor, run)
+
+
+async def monitor_event_loop_lag():
+    """Background task sampling event-loop lag every EVENT_LOOP_LAG_INTERVAL_SECONDS"""
+    interval = settings.EVENT_LOOP_LAG_INTERVAL_SECONDS
+    recent: Deque[Tuple[float, float]] = deque()  # (sampled at, lag)
+    while True:
+        before = time.monotonic()
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        lag = max(0.0, now - before - interval)
+        EVENT_LOOP_LAG.observe(lag)
+
+        recent.append((now, lag))
+        while recent[0][0] < now - settings.EVENT_LOOP_LAG_WINDOW_SECONDS:
+            recent.popleft()
+        EVENT_LOOP_LAG_MAX.set(max(sample for _, sample in recent))
+        if lag > settings.EVENT_LOOP_LAG_WARN_SECONDS:
+            logger.warning("Event loop was blocked for %.3fs", lag)
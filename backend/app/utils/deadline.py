@@ -0,0 +1,76 @@
+"""
+Request deadlines for presentation generation.
+
+A Deadline is started when a generation request arrives and is visible to everything
+the request awaits through deadline_var, the same way request_id_var carries the request
+id. Each stage runs under the smaller of its configured budget and the time left, and
+LLM calls pass the time left to the client as their timeout, so no single slow call can
+outlive the request.
+"""
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """A stage ran out of time before producing anything usable"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"The {stage} stage exceeded its time budget")
+        self.stage = stage
+
+
+@dataclass(frozen=True)
+class Deadline:
+    expires_at: float  # time.monotonic() value
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def stage(self, budget: float, reserve: float = 0.0) -> "Deadline":
+        """A deadline for a stage: budget seconds from now, ending at least reserve seconds before this one"""
+        return Deadline(min(time.monotonic() + budget, self.expires_at - reserve))
+
+
+deadline_var: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, None outside a request with one"""
+    deadline = deadline_var.get()
+    return None if deadline is None else deadline.remaining()
+
+
+@contextmanager
+def stage_deadline(budget: float, reserve: float = 0.0) -> Iterator[Deadline]:
+    """Narrow deadline_var to a stage's budget for the enclosed block"""
+    deadline = deadline_var.get()
+    stage = Deadline.after(budget) if deadline is None else deadline.stage(budget, reserve)
+    token = deadline_var.set(stage)
+    try:
+        yield stage
+    finally:
+        deadline_var.reset(token)
+
+
+async def run_stage(stage: str, awaitable: Awaitable[T], budget: float, reserve: float = 0.0) -> T:
+    """Await a stage under its budget and the request deadline, raising DeadlineExceeded when either runs out"""
+    with stage_deadline(budget, reserve) as deadline:
+        try:
+            return await asyncio.wait_for(awaitable, deadline.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(stage) from None
+        except Exception as e:
+            # e.g. the LLM client's own timeout, which is set to the time left
+            if deadline.remaining() <= 0:
+                raise DeadlineExceeded(stage) from e
+            raise
@@ -0,0 +1,79 @@
+"""
+The embedding model slide embeddings are made with.
+
+Until the first `python -m app.utils.embeddings cutover` that is EMBEDDING_MODEL at its
+native dimensions. From then on it is the model and dimensions of the active
+embedding_migrations row. The API looks it up at startup and then every
+EMBEDDING_MODEL_REFRESH_SECONDS in a background task, off the event loop, so query,
+section and slide embeddings keep matching slide_metadata.embedding after a cutover,
+without a config change or restart. Until a process notices a cutover made elsewhere its
+embeddings have the old dimensions, and the searches and writes using them fail.
+"""
+import asyncio
+import logging
+from typing import NamedTuple, Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.models import EmbeddingMigration
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingModel(NamedTuple):
+    name: str
+    dimensions: Optional[int]  # None for the model's native dimensions, which are then not requested
+
+
+_active: Optional[EmbeddingModel] = None
+
+
+def refresh_embedding_model() -> EmbeddingModel:
+    """Look up the active embedding model now (blocking)"""
+    global _active
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(EmbeddingMigration.model, EmbeddingMigration.dimensions)
+            .filter(EmbeddingMigration.status == "active")
+            .order_by(EmbeddingMigration.id.desc())
+            .first()
+        )
+    except Exception:
+        if _active is None:
+            raise
+        logger.exception("Looking up the active embedding model failed, keeping %s", _active.name)
+        return _active
+    finally:
+        db.close()
+
+    model = EmbeddingModel(*row) if row else EmbeddingModel(settings.EMBEDDING_MODEL, None)
+    if _active is None and model.name != settings.EMBEDDING_MODEL:
+        logger.warning(
+            "Slides are embedded with %s (%d dimensions), which is used instead of EMBEDDING_MODEL %s",
+            model.name, model.dimensions, settings.EMBEDDING_MODEL
+        )
+    elif _active is not None and model != _active:
+        logger.warning("Embedding model changed from %s to %s (%s dimensions)", _active.name, model.name, model.dimensions)
+    _active = model
+    return model
+
+
+async def run_embedding_model_refresher():
+    """Background task looking up the active embedding model every EMBEDDING_MODEL_REFRESH_SECONDS"""
+    while True:
+        await asyncio.sleep(settings.EMBEDDING_MODEL_REFRESH_SECONDS)
+        try:
+            await asyncio.to_thread(refresh_embedding_model)
+        except Exception:
+            logger.exception("Refreshing the active embedding model failed")
+
+
+def active_embedding_model() -> EmbeddingModel:
+    """The cached active embedding model; looked up once here only outside the API, e.g. in scripts"""
+    return _active or refresh_embedding_model()
+
+
+def embedding_dimensions() -> int:
+    """Dimensions of slide_metadata.embedding"""
+    return active_embedding_model().dimensions or settings.EMBEDDING_DIMENSIONS
@@ -0,0 +1,228 @@
+"""
+Slide embedding text and re-embedding of the whole library with a new model.
+
+A migration runs in two steps, and the API keeps serving from slide_metadata.embedding
+throughout:
+
+    python -m app.utils.embeddings backfill --model text-embedding-3-small --dimensions 512
+    python -m app.utils.embeddings cutover
+
+backfill embeds every slide in batches into the embedding_next shadow column and records
+the last slide id it finished in embedding_migrations, so an interrupted run resumes
+where it stopped. cutover re-embeds slides added or edited since, then swaps the columns
+in one transaction (the old one is kept as embedding_previous until `cleanup`). The
+migration then becomes the active embedding model, which running API processes switch to
+within EMBEDDING_MODEL_REFRESH_SECONDS (see app.utils.embedding_model); EMBEDDING_MODEL
+only applies to databases that never had a cutover.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func, or_, text
+from sqlalchemy.orm import Session, load_only
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.models import EmbeddingMigration, SlideMetadata
+from app.utils.embedding_model import refresh_embedding_model
+from app.utils.openai import get_embeddings
+
+logger = logging.getLogger(__name__)
+
+SHADOW_COLUMN = "embedding_next"
+PREVIOUS_COLUMN = "embedding_previous"
+HALFVEC_INDEX = "ix_slide_metadata_embedding_halfvec"
+SHADOW_HALFVEC_INDEX = "ix_slide_metadata_embedding_next_halfvec"
+
+_SEMANTIC_FIELDS = (
+    SlideMetadata.title,
+    SlideMetadata.purpose,
+    SlideMetadata.category,
+    SlideMetadata.tags,
+    SlideMetadata.audience,
+    SlideMetadata.sales_stage,
+)
+
+
+def semantic_payload(slide: SlideMetadata) -> dict:
+    """The metadata a slide's embedding is computed from"""
+    return {
+        "title": slide.title,
+        "purpose": slide.purpose,
+        "category": slide.category,
+        "tags": slide.tags,
+        "audience": slide.audience,
+        "sales_stage": slide.sales_stage
+    }
+
+
+def semantic_text(slide: SlideMetadata) -> str:
+    return json.dumps(semantic_payload(slide))
+
+
+def _vector_literal(vector: List[float]) -> str:
+    return "[" + ",".join(map(str, vector)) + "]"
+
+
+def _has_index(db: Session, name: str) -> bool:
+    return bool(db.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = :name)"), {"name": name}
+    ).scalar())
+
+
+async def _embed_into_shadow(db: Session, slides: List[SlideMetadata], migration: EmbeddingMigration):
+    vectors = await get_embeddings([semantic_text(slide) for slide in slides], migration.model, migration.dimensions)
+    if any(len(vector) != migration.dimensions for vector in vectors):
+        raise ValueError(f"{migration.model} did not return {migration.dimensions}-dimensional embeddings")
+    # Plain SQL so updated_at is left alone; it tells cutover which slides were edited since
+    db.execute(
+        text(f"UPDATE slide_metadata SET {SHADOW_COLUMN} = CAST(:embedding AS vector) WHERE id = :id"),
+        [{"id": slide.id, "embedding": _vector_literal(vector)} for slide, vector in zip(slides, vectors)]
+    )
+
+
+def _slides_query(db: Session):
+    return db.query(SlideMetadata).options(load_only(SlideMetadata.id, *_SEMANTIC_FIELDS)).order_by(SlideMetadata.id)
+
+
+def _in_progress(db: Session) -> Optional[EmbeddingMigration]:
+    return db.query(EmbeddingMigration).filter(EmbeddingMigration.status == "backfilling").first()
+
+
+async def backfill(db: Session, model: str, dimensions: int, batch_size: int) -> EmbeddingMigration:
+    """Embed every slide into the shadow column, resuming from the last checkpoint"""
+    migration = _in_progress(db)
+    if migration and (migration.model, migration.dimensions) != (model, dimensions):
+        raise ValueError(
+            f"A migration to {migration.model} ({migration.dimensions} dimensions) is in progress; "
+            "finish it with cutover first"
+        )
+    if migration is None:
+        migration = EmbeddingMigration(model=model, dimensions=dimensions, status="backfilling")
+        db.add(migration)
+        db.execute(text(f"ALTER TABLE slide_metadata DROP COLUMN IF EXISTS {SHADOW_COLUMN}"))
+        db.execute(text(f"ALTER TABLE slide_metadata ADD COLUMN {SHADOW_COLUMN} vector({dimensions})"))
+        db.commit()
+        logger.info("Started embedding migration %s to %s (%d dimensions)", migration.id, model, dimensions)
+    else:
+        logger.info("Resuming embedding migration %s after slide %s", migration.id, migration.last_slide_id)
+
+    while True:
+        slides = _slides_query(db).filter(SlideMetadata.id > migration.last_slide_id).limit(batch_size).all()
+        if not slides:
+            break
+        await _embed_into_shadow(db, slides, migration)
+        migration.last_slide_id = slides[-1].id
+        migration.processed += len(slides)
+        db.commit()
+        logger.info("Re-embedded %d slides, up to id %d", migration.processed, migration.last_slide_id)
+
+    # Build the half-precision index for the new column ahead of the swap, if the old column has one
+    if _has_index(db, HALFVEC_INDEX):
+        db.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {SHADOW_HALFVEC_INDEX} ON slide_metadata "
+            f"USING hnsw (({SHADOW_COLUMN}::halfvec({dimensions})) halfvec_cosine_ops)"
+        ))
+        db.commit()
+    return migration
+
+
+async def _catch_up(db: Session, migration: EmbeddingMigration, since: datetime, batch_size: int) -> int:
+    """Re-embed slides added after the backfill or edited after `since`"""
+    stale = _slides_query(db).filter(or_(
+        text(f"slide_metadata.{SHADOW_COLUMN} IS NULL"),
+        SlideMetadata.updated_at > since
+    )).all()
+    for start in range(0, len(stale), batch_size):
+        await _embed_into_shadow(db, stale[start:start + batch_size], migration)
+    return len(stale)
+
+
+async def cutover(db: Session, batch_size: int) -> EmbeddingMigration:
+    """Bring the shadow column up to date and swap it in as slide_metadata.embedding atomically"""
+    migration = _in_progress(db)
+    if migration is None:
+        raise ValueError("No embedding migration in progress")
+    # Finishes an interrupted backfill and covers slides added since
+    await backfill(db, migration.model, migration.dimensions, batch_size)
+
+    # Most stragglers are embedded without blocking writers, the rest under the table lock
+    pass_started = db.execute(text("SELECT now()")).scalar()
+    caught_up = await _catch_up(db, migration, migration.started_at, batch_size)
+    db.commit()
+
+    db.execute(text("LOCK TABLE slide_metadata IN SHARE ROW EXCLUSIVE MODE"))
+    caught_up += await _catch_up(db, migration, pass_started, batch_size)
+    db.execute(text(f"ALTER TABLE slide_metadata DROP COLUMN IF EXISTS {PREVIOUS_COLUMN}"))
+    db.execute(text(f"ALTER TABLE slide_metadata RENAME COLUMN embedding TO {PREVIOUS_COLUMN}"))
+    db.execute(text(f"ALTER TABLE slide_metadata RENAME COLUMN {SHADOW_COLUMN} TO embedding"))
+    if _has_index(db, SHADOW_HALFVEC_INDEX):
+        db.execute(text(f"DROP INDEX IF EXISTS {HALFVEC_INDEX}"))
+        db.execute(text(f"ALTER INDEX {SHADOW_HALFVEC_INDEX} RENAME TO {HALFVEC_INDEX}"))
+    db.query(EmbeddingMigration).filter(EmbeddingMigration.status == "active").update(
+        {"status": "superseded"}, synchronize_session=False
+    )
+    migration.status = "active"
+    migration.completed_at = func.now()
+    db.commit()
+    refresh_embedding_model()
+    logger.info(
+        "Cut over to %s (%d dimensions), %d slides re-embedded during cutover",
+        migration.model, migration.dimensions, caught_up
+    )
+    return migration
+
+
+def cleanup(db: Session):
+    """Drop the pre-cutover embeddings kept for rollback"""
+    db.execute(text(f"ALTER TABLE slide_metadata DROP COLUMN IF EXISTS {PREVIOUS_COLUMN}"))
+    db.commit()
+
+
+def _status(db: Session) -> dict:
+    migration = db.query(EmbeddingMigration).order_by(EmbeddingMigration.id.desc()).first()
+    if migration is None:
+        return {"status": "none"}
+    return {
+        "id": migration.id,
+        "model": migration.model,
+        "dimensions": migration.dimensions,
+        "status": migration.status,
+        "processed": migration.processed,
+        "last_slide_id": migration.last_slide_id,
+        "total_slides": db.query(func.count(SlideMetadata.id)).scalar(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = commands.add_parser("backfill", help="Embed all slides into the shadow column (resumable)")
+    backfill_parser.add_argument("--model", required=True)
+    backfill_parser.add_argument("--dimensions", type=int, required=True)
+    for command in (backfill_parser, commands.add_parser("cutover", help="Swap the shadow column in")):
+        command.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    commands.add_parser("status", help="Show the progress of the latest migration")
+    commands.add_parser("cleanup", help="Drop the embeddings kept from before the last cutover")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    db = SessionLocal()
+    try:
+        if args.command == "backfill":
+            asyncio.run(backfill(db, args.model, args.dimensions, args.batch_size))
+        elif args.command == "cutover":
+            asyncio.run(cutover(db, args.batch_size))
+        elif args.command == "cleanup":
+            cleanup(db)
+        print(json.dumps(_status(db), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
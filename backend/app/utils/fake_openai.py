@@ -0,0 +1,170 @@
+"""
+Offline, deterministic stand-in for the OpenAI API used by load tests and benchmarks.
+
+Implements the embeddings and chat completions endpoints (including the json_schema
+response format used by structured parsing). Embeddings are derived from a hash of the
+input, structured completions are generated from the requested JSON schema and free-form
+completions echo the slide text found in the prompt as a JSON rewrite mapping.
+
+    uvicorn app.utils.fake_openai:app --port 8100
+
+and point the API at it with LLM_PROVIDER=fake (or OPENAI_BASE_URL=http://localhost:8100/v1).
+Latency and failures are injected with FAKE_LLM_LATENCY_MS, FAKE_LLM_LATENCY_JITTER_MS,
+FAKE_LLM_ERROR_RATE and FAKE_LLM_SEED.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+SECTIONS = ["introduction", "problem", "solution", "case_study", "timeline", "team", "pricing", "next_steps"]
+
+app = FastAPI(title="Fake OpenAI API")
+
+_error_rng = random.Random(settings.FAKE_LLM_SEED)
+
+
+def hash_embedding(text: str, dimensions: int) -> List[float]:
+    """Deterministic unit-length pseudo-embedding derived from a SHA-256 stream of the text"""
+    values = []
+    counter = 0
+    while len(values) < dimensions:
+        block = hashlib.sha256(f"{counter}:{text}".encode()).digest()
+        values.extend(v / 2**31 for v in struct.unpack("<8i", block))
+        counter += 1
+    values = values[:dimensions]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _pick(seed: str, options: List[str]) -> str:
+    return options[int(hashlib.sha256(seed.encode()).hexdigest(), 16) % len(options)]
+
+
+def _from_schema(schema: Dict[str, Any], defs: Dict[str, Any], seed: str, index: int = 0, name: str = "") -> Any:
+    """Build a canned value conforming to a (strict-mode) JSON schema"""
+    if "$ref" in schema:
+        return _from_schema(defs[schema["$ref"].split("/")[-1]], defs, seed, index, name)
+    if "anyOf" in schema:
+        non_null = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        return _from_schema(non_null[0], defs, seed, index, name) if non_null else None
+
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            prop: _from_schema(prop_schema, defs, f"{seed}.{prop}", index, prop)
+            for prop, prop_schema in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        count = 8 if name == "slides" else 4
+        return [_from_schema(schema.get("items", {}), defs, f"{seed}[{i}]", i, name) for i in range(count)]
+    if kind == "integer":
+        return index + 1
+    if kind == "number":
+        return float(index + 1)
+    if kind == "boolean":
+        return index % 2 == 0
+    if "enum" in schema:
+        return schema["enum"][0]
+    if name == "section":
+        return SECTIONS[index % len(SECTIONS)]
+    if name == "description":
+        return f"Slide {index + 1} covering {SECTIONS[index % len(SECTIONS)].replace('_', ' ')} for the client"
+    return _pick(seed, SECTIONS).replace("_", " ")
+
+
+def _rewrite_mapping(prompt: str) -> Dict[str, str]:
+    """Find the slide JSON embedded in a rewrite prompt and map every original text to a rewrite"""
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"\{", prompt):
+        try:
+            data, _ = decoder.raw_decode(prompt, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict) and isinstance(data.get("text"), dict):
+            return {text: f"{text} (tailored)" for text in data["text"].values() if isinstance(text, str)}
+    return {"content": "Canned completion from the fake LLM"}
+
+
+async def _inject_faults() -> Optional[JSONResponse]:
+    latency = settings.FAKE_LLM_LATENCY_MS + _error_rng.uniform(0, settings.FAKE_LLM_LATENCY_JITTER_MS)
+    if latency > 0:
+        await asyncio.sleep(latency / 1000)
+    if _error_rng.random() < settings.FAKE_LLM_ERROR_RATE:
+        status = _error_rng.choice([429, 500, 503])
+        return JSONResponse(
+            status_code=status,
+            content={"error": {"message": f"Injected fake LLM failure ({status})", "type": "fake_error", "code": status}},
+        )
+    return None
+
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: Request):
+    body = await request.json()
+    if (fault := await _inject_faults()) is not None:
+        return fault
+
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    dimensions = body.get("dimensions") or settings.FAKE_LLM_EMBEDDING_DIMENSIONS
+    tokens = sum(_count_tokens(str(text)) for text in inputs)
+    return {
+        "object": "list",
+        "model": body.get("model"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": hash_embedding(str(text), dimensions)}
+            for i, text in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+@app.post("/v1/chat/completions")
+async def create_chat_completion(request: Request):
+    body = await request.json()
+    if (fault := await _inject_faults()) is not None:
+        return fault
+
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        content = json.dumps(_from_schema(schema, schema.get("$defs", {}), prompt))
+    else:
+        user_prompt = str(body.get("messages", [{}])[-1].get("content", ""))
+        content = json.dumps(_rewrite_mapping(user_prompt))
+
+    prompt_tokens = _count_tokens(prompt)
+    completion_tokens = _count_tokens(content)
+    return {
+        "id": f"chatcmpl-fake-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content, "refusal": None},
+            "finish_reason": "stop",
+            "logprobs": None,
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
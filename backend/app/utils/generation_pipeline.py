@@ -0,0 +1,236 @@
+"""
+Presentation generation as a small dependency graph rather than a fixed sequence:
+
+    outline ─┬─ section embedding 1 ─ match 1 ─┬─ rewrite slide 1 ─┐
+             ├─ section embedding 2 ─ match 2 ─┼─ rewrite slide 2 ─┤
+             └─ ...                            │                   ├─ apply text, store
+                                  first match ─┴─ read template ───┤
+                                     all matches ─ remove unmatched┘
+
+Every section embedding is requested as soon as the outline arrives, each slide's rewrite
+starts as soon as it is matched, and the template is read and pruned on the document
+executor while the rewrites are waiting on the LLM.
+
+Presentations generated together in a batch share a SharedWork: a section that appears in
+several outlines is embedded once and, given the same slides already taken, matched once;
+each template is read once and pruned once per set of kept slides; and their LLM calls
+queue for the process-wide batch_llm_slots.
+"""
+import asyncio
+import contextlib
+import logging
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import PresentationMetadata, SlideMetadata, SlideShape
+from app.schemas import schemas
+from app.utils.blocking import run_blocking
+from app.utils.deadline import Deadline, deadline_var, run_stage, stage_deadline
+from app.utils.metrics import CACHE_EVENTS, observe_stage
+from app.utils.pptx_construction import (
+    apply_text_replacements,
+    best_match,
+    embed_section,
+    generate_presentation_outline,
+    iter_matching_slides,
+    open_presentation,
+    pruned_template,
+    read_template,
+    replacement_request,
+    rewrite_slide,
+    section_search_text,
+    store_presentation,
+)
+from app.utils.result_cache import GeneratedPresentation, presentation_cache, presentation_cache_key, repository_version
+from app.utils.structured_logging import log_payload
+
+logger = logging.getLogger("presentation_generation")
+
+batch_llm_slots = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+
+
+class SharedWork:
+    """
+    Work that presentations generated together can share. A single request gets its own;
+    a batch passes one to all of its items. LLM calls wait for llm_slots when given.
+    """
+
+    def __init__(self, llm_slots: Optional[asyncio.Semaphore] = None):
+        self.llm_slots = llm_slots
+        self._embeddings: Dict[str, asyncio.Future] = {}
+        self._matches: Dict[Tuple[str, FrozenSet[int]], Tuple[Optional[SlideMetadata], float]] = {}
+        self._templates: Dict[str, asyncio.Future] = {}
+        self._pruned: Dict[Tuple[str, Tuple[int, ...]], asyncio.Future] = {}
+
+    def llm_slot(self):
+        return self.llm_slots or contextlib.nullcontext()
+
+    def _once(self, cache: str, futures: Dict, key, make: Callable[[], Awaitable]) -> Awaitable:
+        future = futures.get(key)
+        if future is None:
+            CACHE_EVENTS.labels(cache=cache, outcome="miss").inc()
+            future = futures[key] = asyncio.ensure_future(make())
+        else:
+            CACHE_EVENTS.labels(cache=cache, outcome="hit").inc()
+        # A presentation giving up on it must not cancel it for the others
+        return asyncio.shield(future)
+
+    async def embed_section(self, section: schemas.SlideOutline) -> List[float]:
+        return await self._once("section_embedding", self._embeddings, section_search_text(section),
+                                lambda: embed_section(section))
+
+    def best_match(self, db: Session, section: schemas.SlideOutline, search_embedding: List[float],
+                   used_slide_ids: set, candidate_limit: int, lexical_weight: float):
+        key = (section_search_text(section), frozenset(used_slide_ids))
+        if key not in self._matches:
+            self._matches[key] = best_match(db, section, search_embedding, used_slide_ids, candidate_limit, lexical_weight)
+        return self._matches[key]
+
+    def read_template(self, template_key: str) -> Awaitable[bytes]:
+        """Start reading a template, if no presentation has yet"""
+        return self._once("template", self._templates, template_key, lambda: run_blocking(read_template, template_key))
+
+    async def prepared_template(self, template_key: str, slide_numbers: List[int]):
+        """A private copy of the template reduced to slide_numbers"""
+        async def prune():
+            return await run_blocking(pruned_template, await self.read_template(template_key), slide_numbers)
+
+        data = await self._once("pruned_template", self._pruned, (template_key, tuple(slide_numbers)), prune)
+        return await run_blocking(open_presentation, data)
+
+    def close(self):
+        for future in [*self._embeddings.values(), *self._templates.values(), *self._pruned.values()]:
+            future.cancel()
+
+
+def _slide_texts(db: Session, slide: SlideMetadata) -> List[str]:
+    rows = (
+        db.query(SlideShape.text_content)
+        .filter(SlideShape.slide_metadata_id == slide.id)
+        .order_by(SlideShape.shape_index)
+        .all()
+    )
+    return [text for text, in rows if text and text.strip()]
+
+
+async def _rewrite(
+    request_deadline: Optional[Deadline],
+    shared: SharedWork,
+    request: dict,
+    outline: List[schemas.SlideOutline],
+    input_data: schemas.PresentationInput
+) -> dict:
+    # Started while matching runs under its own budget, so the rewrite budget is taken from the request's
+    deadline_var.set(request_deadline)
+    with stage_deadline(settings.REWRITE_BUDGET_SECONDS, reserve=settings.CONSTRUCTION_RESERVE_SECONDS):
+        return await rewrite_slide(request, outline, input_data, llm_slots=shared.llm_slots)
+
+
+def _finish_presentation(prs, slide_content: List[dict]) -> str:
+    apply_text_replacements(prs, slide_content)
+    return store_presentation(prs)
+
+
+async def build_presentation(
+    input_data: schemas.PresentationInput,
+    db: Session,
+    shared: Optional[SharedWork] = None
+) -> GeneratedPresentation:
+    """
+    Run the generation graph, each stage within its budget and the request deadline, and
+    return the output artifact
+    """
+    shared = shared or SharedWork()
+    request_deadline = deadline_var.get()
+
+    logger.info("Generating presentation outline...")
+    async with shared.llm_slot():
+        with observe_stage("outline"):
+            outline = await run_stage("outline", generate_presentation_outline(input_data), settings.OUTLINE_BUDGET_SECONDS)
+    log_payload(logger, "Generated outline", outline)
+
+    template_key: Optional[str] = None
+    rewrites: List[asyncio.Task] = []
+    kept_slide_numbers: List[int] = []
+
+    async def match_and_dispatch():
+        nonlocal template_key
+        async for slide, section in iter_matching_slides(
+            outline, db, embed=shared.embed_section, match=shared.best_match
+        ):
+            if template_key is None:
+                # The deck of the first matched slide is the template
+                template_key = db.query(PresentationMetadata.storage_path).filter(
+                    PresentationMetadata.id == slide.presentation_id
+                ).scalar()
+                logger.debug("Using template from: %s", template_key)
+                shared.read_template(template_key)
+
+            texts = _slide_texts(db, slide)
+            if not texts:
+                continue  # Slides without text are left out of the deck
+            logger.debug("Matched slide", extra={"slide": {"id": slide.id, "title": slide.title, "section": section.section}})
+            kept_slide_numbers.append(slide.slide_number)
+            request = replacement_request({"slideNumber": slide.slide_number, "section": section, "text": dict(enumerate(texts))})
+            rewrites.append(asyncio.create_task(_rewrite(request_deadline, shared, request, outline, input_data)))
+
+    prepared = None
+    try:
+        logger.info("Matching slides and rewriting them as they are matched...")
+        await run_stage("matching", match_and_dispatch(), settings.MATCHING_BUDGET_SECONDS)
+        if template_key is None:
+            raise ValueError("No slides in the repository match the outline")
+        prepared = asyncio.ensure_future(shared.prepared_template(template_key, sorted(kept_slide_numbers)))
+
+        slide_content = list(await asyncio.gather(*rewrites))
+        log_payload(logger, "Generated content", slide_content)
+
+        logger.info("Constructing final presentation...")
+        with observe_stage("construction"):
+            result = await run_blocking(_finish_presentation, await prepared, slide_content)
+    finally:
+        for task in [prepared, *rewrites]:
+            if task is not None and not task.done():
+                task.cancel()
+
+    # The constructed deck keeps the template's slide order
+    output_order = sorted(item["slide_id"] for item in slide_content)
+    degraded_slides = sorted(output_order.index(item["slide_id"]) + 1 for item in slide_content if item.get("degraded"))
+    logger.info("Presentation result %s", result)
+    if degraded_slides:
+        logger.warning("Slides %s kept their original text", degraded_slides)
+    return GeneratedPresentation(result, degraded_slides, template_key, sorted(kept_slide_numbers))
+
+
+async def build_presentation_batch(
+    inputs: List[schemas.PresentationInput],
+    db: Session
+) -> List[Union[GeneratedPresentation, Exception]]:
+    """
+    Generate several presentations sharing one SharedWork, within the current deadline.
+    Identical inputs are generated once. Each item's result is its presentation or the
+    exception that generating it raised.
+    """
+    shared = SharedWork(batch_llm_slots)
+    version = repository_version(db)
+    runs: Dict[str, asyncio.Future] = {}
+
+    async def generate(cache_key: str, input_data: schemas.PresentationInput) -> GeneratedPresentation:
+        if settings.RESULT_CACHE_ENABLED:
+            return await presentation_cache.get_or_create(cache_key, lambda: build_presentation(input_data, db, shared))
+        return await build_presentation(input_data, db, shared)
+
+    items = []
+    for input_data in inputs:
+        cache_key = presentation_cache_key(input_data, version)
+        if cache_key not in runs:
+            runs[cache_key] = asyncio.ensure_future(generate(cache_key, input_data))
+        items.append(runs[cache_key])
+    try:
+        return list(await asyncio.gather(*items, return_exceptions=True))
+    finally:
+        for run in runs.values():
+            run.cancel()
+        shared.close()
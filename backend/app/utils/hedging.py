@@ -0,0 +1,101 @@
+"""
+Hedged LLM requests (LLM_HEDGING_ENABLED).
+
+Latencies of recent calls are kept per operation and model. When a call has not answered
+within the LLM_HEDGE_PERCENTILE of those latencies, an identical second request is sent;
+whichever succeeds first is used and the other is cancelled. Every call earns
+LLM_HEDGE_MAX_RATE of a hedge and each hedge spends one, so across the process at most
+that fraction of calls is duplicated, however slow the provider gets.
+"""
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from app.config import settings
+from app.utils.metrics import LLM_HEDGES
+
+R = TypeVar("R")
+
+_MAX_HEDGE_CREDIT = 10.0  # Hedges that may be sent back to back after a quiet spell
+
+
+class LatencyWindow:
+    """The most recent latencies of one kind of call"""
+
+    def __init__(self, size: int):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile, None until there are LLM_HEDGE_MIN_SAMPLES samples"""
+        if len(self._samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+async def _first_success(first: asyncio.Task, second: asyncio.Task) -> asyncio.Task:
+    """The task that completes successfully first; if both fail, first's error is raised"""
+    pending = {first, second}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in (first, second):
+            if task in done and task.exception() is None:
+                return task
+    second.exception()  # Retrieved, so only first's error is reported
+    raise first.exception()
+
+
+class Hedger:
+    def __init__(self):
+        self._windows: Dict[Tuple[str, str], LatencyWindow] = defaultdict(
+            lambda: LatencyWindow(settings.LLM_HEDGE_WINDOW)
+        )
+        self._credit = _MAX_HEDGE_CREDIT
+
+    def _take_hedge(self) -> bool:
+        if self._credit < 1:
+            return False
+        self._credit -= 1
+        return True
+
+    async def call(self, operation: str, model: str, make_call: Callable[[], Awaitable[R]]) -> R:
+        """Await make_call(), calling it a second time if the first takes longer than usual"""
+        if not settings.LLM_HEDGING_ENABLED:
+            return await make_call()
+
+        window = self._windows[(operation, model)]
+        self._credit = min(self._credit + settings.LLM_HEDGE_MAX_RATE, _MAX_HEDGE_CREDIT)
+        threshold = window.percentile(settings.LLM_HEDGE_PERCENTILE)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(make_call())
+        hedge = None
+        try:
+            if threshold is not None:
+                await asyncio.wait({primary}, timeout=threshold)
+                if not primary.done():
+                    if self._take_hedge():
+                        hedge = asyncio.ensure_future(make_call())
+                    else:
+                        LLM_HEDGES.labels(operation=operation, outcome="capped").inc()
+            if hedge is None:
+                result = await primary
+            else:
+                winner = await _first_success(primary, hedge)
+                LLM_HEDGES.labels(
+                    operation=operation, outcome="hedge_won" if winner is hedge else "primary_won"
+                ).inc()
+                result = winner.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+        # The latency the caller saw, i.e. until the first answer when a hedge was sent
+        window.add(time.monotonic() - started)
+        return result
+
+
+hedger = Hedger()
@@ -0,0 +1,97 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Generation: outline, section_embedding, matching, rewrite (per slide), construction
+# Ingestion: parse_deck (loading a deck), analyse_slide (per slide), extract_shapes (whole deck),
+# slide_embedding, libreoffice_render, pdf_rasterize, db_commit
+STAGE_LATENCY = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Latency of generation and ingestion pipeline stages",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "Calls made to the LLM provider",
+    ["operation", "model", "status"],
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the LLM provider",
+    ["operation", "model", "kind"],
+)
+
+PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens",
+    "Locally counted tokens of budgeted prompts, by whether they fit the budget",
+    ["operation", "outcome"],
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+
+PROMPT_TOKENS_SAVED = Counter(
+    "llm_prompt_tokens_saved_total",
+    "Prompt tokens saved by budgeted prompts compared with sending the full context",
+    ["operation"],
+)
+
+LLM_HEDGES = Counter(
+    "llm_hedged_requests_total",
+    "Slow LLM calls by hedging outcome: hedge_won or primary_won after a duplicate was sent, capped when the hedge-rate cap prevented one",
+    ["operation", "outcome"],
+)
+
+DEGRADED_SLIDES = Counter(
+    "generation_degraded_slides_total",
+    "Generated slides that kept their original text, by why the rewrite was skipped (deadline, error)",
+    ["reason"],
+)
+
+DOCUMENT_QUEUE_WAIT = Histogram(
+    "document_executor_queue_seconds",
+    "Time document work (python-pptx, file I/O, LibreOffice) waited for a free executor thread",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke up from a short sleep, i.e. how long it was blocked",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+EVENT_LOOP_LAG_MAX = Gauge(
+    "event_loop_lag_max_seconds",
+    "Longest event-loop stall over the last EVENT_LOOP_LAG_WINDOW_SECONDS",
+)
+
+CACHE_EVENTS = Counter(
+    "cache_events_total",
+    "Cache lookups by outcome (hit, miss, coalesced)",
+    ["cache", "outcome"],
+)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """Record the wall-clock time spent in the enclosed block under the given stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def record_llm_call(operation: str, model: str, response=None, status: str = "ok"):
+    """Count an LLM call and the tokens from its usage block, if the response carries one"""
+    LLM_CALLS.labels(operation=operation, model=model, status=status).inc()
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        tokens = getattr(usage, kind, None)
+        if tokens:
+            LLM_TOKENS.labels(operation=operation, model=model, kind=kind.removesuffix("_tokens")).inc(tokens)
@@ -1,46 +1,146 @@
+import logging
 import os
-from openai import AsyncOpenAI, OpenAI
-from typing import TypeVar, Type
+from collections import OrderedDict
+from openai import AsyncOpenAI
+from typing import Tuple, TypeVar, Type
 from pydantic import BaseModel
+from app.config import settings
+from app.utils.deadline import remaining_time
+from app.utils.embedding_model import EmbeddingModel, active_embedding_model
+from app.utils.hedging import hedger
+from app.utils.metrics import CACHE_EVENTS, record_llm_call
 
-async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-sync_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+def _client_options() -> dict:
+    """Connection options for the configured LLM provider"""
+    if settings.LLM_PROVIDER == "fake":
+        # The fake server ignores the key, but the client refuses to start without one
+        return {"api_key": os.getenv("OPENAI_API_KEY") or "fake", "base_url": settings.FAKE_LLM_BASE_URL}
+    if settings.LLM_PROVIDER != "openai":
+        raise ValueError(f"Unknown LLM_PROVIDER: {settings.LLM_PROVIDER}")
+    return {"api_key": os.getenv("OPENAI_API_KEY"), "base_url": settings.OPENAI_BASE_URL or None}
+
+async_client = AsyncOpenAI(**_client_options())
+
+logger = logging.getLogger(__name__)
+
+
+def _client() -> AsyncOpenAI:
+    """The client, with the time left before the current request's deadline as its timeout"""
+    remaining = remaining_time()
+    if remaining is None:
+        return async_client
+    return async_client.with_options(timeout=max(remaining, 0.01))
 
 T = TypeVar('T', bound=BaseModel)
 
+def _dimensions_option(model: EmbeddingModel) -> dict:
+    return {"dimensions": model.dimensions} if model.dimensions else {}
+
 async def get_embedding(text: str) -> list[float]:
-    print("getting embedding from Open AI... String Object: ", text)
-    response = await async_client.embeddings.create(
-        model="text-embedding-ada-002",
-        input=text
-    )
+    """Embed text with the active embedding model"""
+    logger.debug("Requesting embedding", extra={"chars": len(text)})
+    model = active_embedding_model()
+
+    async def call():
+        try:
+            response = await _client().embeddings.create(
+                model=model.name,
+                input=text,
+                **_dimensions_option(model)
+            )
+        except Exception:
+            record_llm_call("embedding", model.name, status="error")
+            raise
+        record_llm_call("embedding", model.name, response)
+        return response
+
+    response = await hedger.call("embedding", model.name, call)
     return response.data[0].embedding 
 
+async def get_embeddings(texts: list[str], model: str | None = None, dimensions: int | None = None) -> list[list[float]]:
+    """
+    Embed several texts with one API call, with the active embedding model unless model is
+    given; dimensions shortens the vectors of models that support it
+    """
+    if model is None:
+        model, dimensions = active_embedding_model()
+    options = {"dimensions": dimensions} if dimensions else {}
+    try:
+        response = await _client().embeddings.create(model=model, input=texts, **options)
+    except Exception:
+        record_llm_call("embedding_batch", model, status="error")
+        raise
+    record_llm_call("embedding_batch", model, response)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+_embedding_cache: "OrderedDict[Tuple[EmbeddingModel, str], list[float]]" = OrderedDict()
+
+async def get_cached_embedding(text: str) -> list[float]:
+    """get_embedding behind an in-process LRU cache, for texts that repeat such as search queries"""
+    model = active_embedding_model()
+    if _embedding_cache and next(iter(_embedding_cache))[0] != model:
+        # Embeddings of the previous model are useless after a cutover
+        _embedding_cache.clear()
+    key = (model, text)
+    embedding = _embedding_cache.get(key)
+    if embedding is not None:
+        _embedding_cache.move_to_end(key)
+        CACHE_EVENTS.labels(cache="embedding", outcome="hit").inc()
+        return embedding
+
+    CACHE_EVENTS.labels(cache="embedding", outcome="miss").inc()
+    embedding = await get_embedding(text)
+    _embedding_cache[key] = embedding
+    while len(_embedding_cache) > settings.EMBEDDING_CACHE_MAX_ENTRIES:
+        _embedding_cache.popitem(last=False)
+    return embedding
+
 async def get_formatted_completion(
     system_prompt: str,
     user_prompt: str,
     format_model: Type[T],
-    model: str = "gpt-4o-2024-08-06"
+    model: str | None = None
 ) -> T:
     """Get a structured completion from OpenAI"""
-    completion = sync_client.beta.chat.completions.parse(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        response_format=format_model,
-    )
+    model = model or settings.OUTLINE_MODEL
 
+    async def call():
+        try:
+            completion = await _client().beta.chat.completions.parse(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                response_format=format_model,
+            )
+        except Exception:
+            record_llm_call("formatted_completion", model, status="error")
+            raise
+        record_llm_call("formatted_completion", model, completion)
+        return completion
+
+    completion = await hedger.call("formatted_completion", model, call)
     return completion.choices[0].message.parsed
 
-async def get_completion(prompt: str, system_prompt: str = "You are a helpful assistant.", model: str = "gpt-3.5-turbo") -> str:
-    response = await async_client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    
-    return response.choices[0].message.content
\ No newline at end of file
+async def get_completion(prompt: str, system_prompt: str = "You are a helpful assistant.", model: str | None = None) -> str:
+    model = model or settings.COMPLETION_MODEL
+
+    async def call():
+        try:
+            response = await _client().chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ]
+            )
+        except Exception:
+            record_llm_call("completion", model, status="error")
+            raise
+        record_llm_call("completion", model, response)
+        return response
+
+    response = await hedger.call("completion", model, call)
+    return response.choices[0].message.content
@@ -1,9 +1,11 @@
+import asyncio
+import contextlib
 from datetime import datetime
 import time
 from http.client import HTTPException
 import os
-import shutil
-from typing import List, Tuple
+import io
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 from pptx import Presentation
 from copy import deepcopy
 from pptx.enum.shapes import MSO_SHAPE_TYPE, PP_PLACEHOLDER, MSO_SHAPE_TYPE, MSO_SHAPE
@@ -13,10 +15,17 @@ from pptx.util import Pt
 from pptx.shapes.placeholder import SlidePlaceholder
 from app.schemas import schemas
 from app.models.models import SlideMetadata
+from app.utils.artifact_store import store_file
+from app.utils.storage import spooled_file, storage
+from app.utils.deadline import remaining_time
+from app.utils.metrics import DEGRADED_SLIDES, STAGE_LATENCY, observe_stage
+from app.config import settings
 from app.utils.openai import get_completion, get_formatted_completion, get_embedding
+from app.utils.prompt_budget import build_rewrite_prompt
+from app.utils.slide_search import retrieve_candidates
+from app.utils.structured_logging import log_payload
 from sqlalchemy.orm import Session
 import json
-import numpy as np
 import logging
 from pathlib import Path
 
@@ -84,52 +93,105 @@ async def generate_presentation_outline(input_data: schemas.PresentationInput) -
     # Convert to SlideOutline objects with validation
     return [schemas.SlideOutline(**slide.model_dump()) for slide in response.slides]
 
-async def find_matching_slides_remix(
+def section_search_text(section: schemas.SlideOutline) -> str:
+    """The text an outline section is embedded as for matching"""
+    search_content = {
+        "section": section.section,
+        "description": section.description,
+        "keywords": section.keywords
+    }
+    return json.dumps(search_content)
+
+async def embed_section(section: schemas.SlideOutline) -> List[float]:
+    with observe_stage("section_embedding"):
+        return await get_embedding(section_search_text(section))
+
+async def iter_matching_slides(
     outline: List[schemas.SlideOutline], 
     db: Session,
-    similarity_threshold: float = 0.7
-) -> List[Tuple[SlideMetadata, int]]:
-    """Find the best matching slides for each outline section using semantic search"""
-    matched_slides = []
+    similarity_threshold: float = 0.7,
+    candidate_limit: int | None = None,
+    lexical_weight: float | None = None,
+    embed: Callable[[schemas.SlideOutline], Awaitable[List[float]]] | None = None,
+    match: Callable[..., Tuple[SlideMetadata | None, float]] | None = None
+) -> AsyncIterator[Tuple[SlideMetadata, schemas.SlideOutline]]:
+    """
+    Yield the best matching slide for each outline section, with the section, as soon as it
+    is known. All section embeddings are requested at once; sections are matched in outline
+    order since each one excludes the slides taken by the sections before it.
+    See find_matching_slides_remix for the scoring. embed and match replace embed_section
+    and best_match, e.g. to share them between presentations.
+    """
+    candidate_limit = candidate_limit or settings.MATCH_CANDIDATE_LIMIT
+    lexical_weight = settings.MATCH_LEXICAL_WEIGHT if lexical_weight is None else lexical_weight
+    embed = embed or embed_section
+    match = match or best_match
     used_slide_ids = set()  # Track already matched slide IDs
-    
-    for section in outline:
-        search_content = {
-            "section": section.section,
-            "description": section.description,
-            "keywords": section.keywords
-        }
-        search_embedding = await get_embedding(json.dumps(search_content))
-        
-        slides = db.query(SlideMetadata).all()
-        best_match = None
-        best_similarity = -1
-        
-        for slide in slides:
-            if slide.embedding is None or slide.id in used_slide_ids:
-                continue  # Skip already selected slides
-                
-            similarity = np.dot(search_embedding, slide.embedding) / (
-                np.linalg.norm(search_embedding) * np.linalg.norm(slide.embedding)
+    embeddings = [asyncio.ensure_future(embed(section)) for section in outline]
+
+    try:
+        for section, embedding in zip(outline, embeddings):
+            search_embedding = await embedding
+            best_slide, best_similarity = match(
+                db, section, search_embedding, used_slide_ids, candidate_limit, lexical_weight
             )
+            if best_slide and best_similarity >= similarity_threshold:
+                used_slide_ids.add(best_slide.id)  # Add slide.id to the used set
+                yield best_slide, section
+            else:
+                logger.warning("No good match found for section %s", section.section)
+    finally:
+        for embedding in embeddings:
+            embedding.cancel()
+
+async def find_matching_slides_remix(
+    outline: List[schemas.SlideOutline], 
+    db: Session,
+    similarity_threshold: float = 0.7,
+    candidate_limit: int | None = None,
+    lexical_weight: float | None = None
+) -> List[Tuple[SlideMetadata, schemas.SlideOutline]]:
+    """
+    Find the best matching slides for each outline section using hybrid search: a first stage
+    retrieves candidates by full-text rank over slide text and by embedding distance, then
+    each candidate is scored on embedding similarity plus a bonus for its lexical rank.
+    Returns each matched slide with the section it was matched to.
+    """
+    return [
+        match async for match in iter_matching_slides(
+            outline, db, similarity_threshold, candidate_limit, lexical_weight
+        )
+    ]
+
+def best_match(
+    db: Session,
+    section: schemas.SlideOutline,
+    search_embedding: List[float],
+    used_slide_ids: set,
+    candidate_limit: int,
+    lexical_weight: float
+) -> Tuple[SlideMetadata | None, float]:
+    with observe_stage("matching"):
+        query_text = " ".join([section.section.replace("_", " "), section.description, *(section.keywords or [])])
+        candidates = retrieve_candidates(
+            db, query_text, search_embedding, candidate_limit, exclude_ids=used_slide_ids  # Skip already selected slides
+        )
+        best_slide = None
+        best_similarity = -1
+    
+        for candidate in candidates:
+            slide = candidate.slide
 
             score_multiplier = 1.0
             if section.section.lower() == slide.category.lower():
                 score_multiplier *= 1.2
 
-            final_similarity = similarity * score_multiplier
+            final_similarity = candidate.similarity * score_multiplier + lexical_weight * candidate.lexical_rank
 
             if final_similarity > best_similarity:
                 best_similarity = final_similarity
-                best_match = (slide, slide.id)
-        
-        if best_match and best_similarity >= similarity_threshold:
-            matched_slides.append(best_match)
-            used_slide_ids.add(best_match[1])  # Add slide.id to the used set
-        else:
-            print(f"Warning: No good match found for section {section.section}")
-    
-    return matched_slides
+                best_slide = slide
+    return best_slide, best_similarity
 
 def getOriginals(file_path, slide_ids):
     if not os.path.exists(file_path):
@@ -144,16 +206,12 @@ def getOriginals(file_path, slide_ids):
     return originals
 
 
-async def generate_slide_content_remix(
-    slides,
-    outline: List[schemas.SlideOutline],
-    presentation_input: schemas.PresentationInput,
-    max_retries: int = 3
-) -> List[dict]:
-    """Generate customized content for each slide based on the outline."""
-    slide_content_list = []
+async def _pause_before_retry(seconds: float = 2.0):
+    remaining = remaining_time()
+    await asyncio.sleep(seconds if remaining is None else min(seconds, remaining))
 
-    system_prompt = """You are an expert presentation content writer. 
+
+REWRITE_SYSTEM_PROMPT = """You are an expert presentation content writer. 
     Your task is to refine and enhance the provided slide text while maintaining clarity, professionalism, and conciseness.
 
     ### Rules:
@@ -162,131 +220,147 @@ async def generate_slide_content_remix(
     3. The output should be a **JSON object where the original text is the key and the rewritten text is the value**.
     """
 
-    # Convert slide data into replacement text format
-    replacement_list = []
-    for slide in slides:
-        replacement_obj = {"slideNumber": slide["slideNumber"]}
-        text_replacements = {}
-        
-        replacement_counter = 1  # Reset counter for each slide
+
+def replacement_request(slide: dict) -> dict:
+    """A slide ({"slideNumber", "section", "text"}) with its texts keyed replacement1, replacement2, ..."""
+    return {
+        "slideNumber": slide["slideNumber"],
+        "section": slide.get("section"),
+        "text": {f"replacement{number}": text for number, text in enumerate(slide["text"].values(), start=1)}
+    }
+
+
+async def rewrite_slide(
+    obj: dict,
+    outline: List[schemas.SlideOutline],
+    presentation_input: schemas.PresentationInput,
+    max_retries: int = 3,
+    llm_slots: Optional[asyncio.Semaphore] = None
+) -> dict:
+    """
+    Rewrite the text of one slide (see replacement_request) within the current deadline.
+    A slide that could not be rewritten in time, or at all, keeps its original text and is
+    marked "degraded". Each completion attempt, but not the pauses between them, holds one
+    of llm_slots when given.
+    """
+    logger.debug("Rewriting slide %s", obj['slideNumber'])
+    rewrite_started = time.perf_counter()
+
+    prompt = build_rewrite_prompt(obj, obj["section"], outline, presentation_input)
+    parsed_response = None
+    degraded_reason = "error"
+
+    async def complete() -> str:
+        async with llm_slots or contextlib.nullcontext():
+            return await get_completion(prompt=prompt, system_prompt=REWRITE_SYSTEM_PROMPT)
+
+    for attempt in range(max_retries):
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            degraded_reason = "deadline"
+            break
+        try:
+            # Waiting for a slot counts against the deadline too
+            modified_content = await asyncio.wait_for(complete(), remaining)
+        except asyncio.TimeoutError:
+            degraded_reason = "deadline"
+            break
+        except Exception as e:
+            logger.warning("API request failed on attempt %d for slide %s: %s", attempt + 1, obj['slideNumber'], e)
+            continue  # Retry
+
+        if not modified_content:
+            logger.warning("Attempt %d failed for slide %s: Empty response.", attempt + 1, obj['slideNumber'])
+            await _pause_before_retry()
+            continue  
         
-        for section_text in slide["text"].values():
-            key = f"replacement{replacement_counter}"
-            text_replacements[key] = section_text
-            replacement_counter += 1
-
-        replacement_obj["text"] = text_replacements
-        replacement_list.append(replacement_obj)
-
-    for obj_index, obj in enumerate(replacement_list, start=1):
-        print(f"🔹 Processing Slide {obj['slideNumber']}")
-
-        for attempt in range(max_retries):
-            prompt = f"""
-            Your task is to **rewrite the text provided while keeping its meaning intact but have fun with it!
-            Don't be afraid to be creative and add a bit of flair to the text to make it more engaging and interesting and 
-            different from the original text.**.
-            **.
-            use this outline as a guide:
-            {outline}
-
-            and include this data it is about the team, client etc:
-            {presentation_input}
-
-            ### **Original Slide Content:**
-            {json.dumps(obj, indent=4)}
-
-            ### **Output Format (JSON)**
-            Return a JSON object where:
-            - **Each key is the original text**.
-            - **Each value is the rewritten text**.
-
-            Example:
-            ```json
-            {{
-                "Original Text 1": "Rewritten Text 1",
-                "Original Text 2": "Rewritten Text 2"
-            }}
-            ```
-            """
-            try:
-                modified_content = await get_completion(
-                    prompt=prompt,
-                    system_prompt=system_prompt
-                )
-            except Exception as e:
-                print(f"❌ API request failed on attempt {attempt + 1} for slide {obj['slideNumber']}: {e}")
-                continue  # Retry
-
-            if not modified_content:
-                print(f"⚠️ Attempt {attempt + 1} failed for slide {obj['slideNumber']}: Empty response.")
-                time.sleep(2)  
-                continue  
-            
-            # Remove Markdown-style formatting from GPT response
-            response = modified_content.strip("```").strip()
-            try:
-                parsed_response = json.loads(response)  
-
-                slide_content_list.append({
-                    "slide_id": obj["slideNumber"],  
-                    "content": parsed_response
-                })
-
-                print(f"✅ Success for slide {obj['slideNumber']}")
-                break  # Exit retry loop on success
-
-            except json.JSONDecodeError as e:
-                print(f"❌ Attempt {attempt + 1} failed for slide {obj['slideNumber']}: {e}")
-                print("Raw response:", response)
-                time.sleep(2)  # Wait before retrying
-
-    return slide_content_list
-  
+        # Remove Markdown-style formatting from GPT response
+        response = modified_content.strip("```").strip()
+        try:
+            parsed_response = json.loads(response)  
+            logger.debug("Rewrote slide %s", obj['slideNumber'])
+            break  # Exit retry loop on success
+
+        except json.JSONDecodeError as e:
+            logger.warning("Attempt %d failed for slide %s: %s", attempt + 1, obj['slideNumber'], e)
+            log_payload(logger, "Raw response", response)
+            await _pause_before_retry()
+
+    STAGE_LATENCY.labels(stage="rewrite").observe(time.perf_counter() - rewrite_started)
+    if parsed_response is None:
+        # Keep the slide in the deck with its original text
+        logger.warning("Slide %s keeps its original text (%s)", obj['slideNumber'], degraded_reason)
+        DEGRADED_SLIDES.labels(reason=degraded_reason).inc()
+        return {"slide_id": obj["slideNumber"], "content": {}, "degraded": True}
+    return {"slide_id": obj["slideNumber"], "content": parsed_response}
+
+
+async def generate_slide_content_remix(
+    slides,
+    outline: List[schemas.SlideOutline],
+    presentation_input: schemas.PresentationInput,
+    max_retries: int = 3
+) -> List[dict]:
+    """
+    Generate customized content for each slide based on the outline, rewriting the slides
+    concurrently. A slide's prompt carries its matched outline section (slide["section"])
+    rather than the whole outline.
+    """
+    return list(await asyncio.gather(*(
+        rewrite_slide(replacement_request(slide), outline, presentation_input, max_retries)
+        for slide in slides
+    )))
+
+
 def construct_presentation_remix(original_slides, output_path, slide_data):
     """Copy selected slides from template and modify content"""
 
     path_to_copy_project = copyOG_remix_remix(original_slides, slide_data)
-    print (path_to_copy_project)
+    logger.debug("Constructed presentation %s", path_to_copy_project)
     return path_to_copy_project
 
 
 
-def copyOG_remix_remix(original_slides, replacements):
+def load_template(template_key: str):
+    """Open a stored deck, fully in memory, as the template of a generated presentation"""
+    with storage.local_copy(template_key) as template_path:
+        return Presentation(template_path)
 
-    slide_ids = sorted(item["slide_id"] for item in replacements if "slide_id" in item)
-    output_dir = Path("presentation_output")
-    output_dir.mkdir(exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_filename = f"duplicated_{timestamp}.pptx"
-    output_path = output_dir / output_filename
+def read_template(template_key: str) -> bytes:
+    """A stored deck's bytes, for templates opened more than once"""
+    with storage.local_copy(template_key) as template_path:
+        return Path(template_path).read_bytes()
 
-    # Copy
-    outputPath = shutil.copy2(original_slides, output_path)
 
-    # Modify
-    newOutputPath = modify_ppt_text_remix(outputPath, replacements)
-    prs = Presentation(newOutputPath)
+def pruned_template(template: bytes, slide_numbers) -> bytes:
+    """A template deck reduced to slide_numbers (see keep_slides), saved back to bytes"""
+    prs = keep_slides(Presentation(io.BytesIO(template)), slide_numbers)
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
 
-    #Removal
-    keep_slide_ids = {i - 1 for i in slide_ids}  # Adjust for zero-based index
+
+def open_presentation(data: bytes):
+    return Presentation(io.BytesIO(data))
+
+
+def keep_slides(prs, slide_numbers):
+    """Remove every slide whose (1-based) number is not in slide_numbers"""
+    keep_slide_ids = {i - 1 for i in slide_numbers}  # Adjust for zero-based index
     slides_to_remove = [i for i in range(len(prs.slides)) if i not in keep_slide_ids]
     xml_slides = prs.slides._sldIdLst
 
     for slide_index in reversed(slides_to_remove):  
+        # Drop the relationship too, or the removed slide parts are still saved, under names
+        # that collide with the renumbered kept slides once the deck is opened and saved again
+        prs.part.drop_rel(xml_slides[slide_index].rId)
         xml_slides.remove(xml_slides[slide_index])  
-    # And Done
-    prs.save(newOutputPath)
-    return str(newOutputPath)
+    return prs
 
 
-def modify_ppt_text_remix(file_path, replacements):
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found")
-    prs = Presentation(file_path)
-
+def apply_text_replacements(prs, replacements):
+    """Replace every paragraph whose text is a key of the rewritten content of any slide"""
     merged_content = {}
 
     for slide in replacements:
@@ -303,19 +377,42 @@ def modify_ppt_text_remix(file_path, replacements):
                         runs = paragraph.runs                   
 
                         if len(runs) == 1:
-                            print(f"Replacing text: {runs[0].text} with -> {new_text}")
+                            logger.debug("Replacing text: %s with -> %s", runs[0].text, new_text)
                             runs[0].text = new_text
                         else:
                             first_run = runs[0] 
                             for run in runs:
-                                print(f"Run Text Before: {run.text}")
+                                logger.debug("Run Text Before: %s", run.text)
                                 run.text = ""
                             first_run.text = new_text if new_text.strip() else " "  
+    return prs
+
+
+def store_presentation(prs) -> str:
+    """Save a generated presentation as a content-addressed output artifact"""
+    with spooled_file(".pptx") as output_path:
+        prs.save(output_path)
+        return store_file("outputs", Path(output_path), prefix="presentation_", suffix=".pptx")
+
+
+def copyOG_remix_remix(original_slides, replacements):
+
+    slide_ids = sorted(item["slide_id"] for item in replacements if "slide_id" in item)
 
+    # Removal first, so only the kept slides are searched for text to replace
+    prs = keep_slides(load_template(original_slides), slide_ids)
+    apply_text_replacements(prs, replacements)
+    return store_presentation(prs)
 
-    file_path = Path(file_path)  # Ensure it's a Path object
-    final_path = file_path.parent / "final_presentation.pptx"  # Keep same folder, change filename
 
+def modify_ppt_text_remix(file_path, replacements):
+    
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    prs = Presentation(file_path)
+    apply_text_replacements(prs, replacements)
+
+    final_path = Path(file_path)  # Ensure it's a Path object
     prs.save(final_path)
     return final_path
 
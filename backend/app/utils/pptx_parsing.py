@@ -1,18 +1,29 @@
 from pptx import Presentation
 from pptx.enum.shapes import MSO_SHAPE_TYPE, PP_PLACEHOLDER, MSO_SHAPE_TYPE
-from datetime import datetime
-from typing import Union, Tuple, List, Dict, BinaryIO
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from typing import Union, Tuple, List, Dict, BinaryIO, Optional
 from sqlalchemy.orm import Session
-from app.models.models import SlideMetadata, SlideShape
+from app.models.models import PresentationMetadata, SlideMetadata, SlideShape
+from collections import defaultdict
+import hashlib
+import io
 import shutil
 from pathlib import Path
-import json
+from app.config import settings
+from app.utils.artifact_store import store_file, store_stream
+from app.utils.blocking import run_blocking
+from app.utils.storage import storage
+from app.utils.metrics import STAGE_LATENCY, observe_stage
+from app.utils.embeddings import semantic_text
 from app.utils.openai import get_embedding
-import uuid
+from app.utils.slide_search import refresh_search_vectors
 from pdf2image import convert_from_path
 import tempfile
 import subprocess
+import time
+import logging
 
+logger = logging.getLogger(__name__)
 
 
 async def process_powerpoint_repository(
@@ -34,68 +45,231 @@ async def process_powerpoint_repository(
     
     Returns:
         Tuple containing:
-            - storage_path: Path where the presentation was stored
+            - storage_path: Storage key under which the presentation was stored
             - List of SlideMetadata objects
             - List of image paths
     """
-    # Create storage directory if it doesn't exist
-    storage_dir = Path("slides_repository")
-    storage_dir.mkdir(exist_ok=True)
+    storage_path = await run_blocking(_store_presentation_file, pptx_source, source_type)
+    presentation, image_paths = await run_blocking(_load_and_render, storage_path)
     
-    # Generate unique filename using timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    storage_path = storage_dir / f"presentation_{timestamp}.pptx"
+    # Create metadata objects for each slide
+    slide_metadata_objects = []
     
-    # Handle different input types and save to storage
+    for slide_idx, (slide, image_path) in enumerate(zip(presentation.slides, image_paths)):
+        metadata = SlideMetadata(slide_number=slide_idx + 1)
+        await _populate_slide_metadata(metadata, slide, image_path)
+        slide_metadata_objects.append(metadata)
+    
+    return storage_path, slide_metadata_objects, image_paths
+
+def _load_and_render(storage_path: str):
+    """
+    Open a stored deck and render its slides to images. With LAZY_SLIDE_RENDERING the
+    image paths are None, and slides are rendered when first requested (see slide_rendering).
+    """
+    with storage.local_copy(storage_path) as local_path:
+        with observe_stage("parse_deck"):
+            presentation = Presentation(local_path)
+
+        if settings.LAZY_SLIDE_RENDERING:
+            return presentation, [None] * len(presentation.slides)
+
+        # After saving the file, generate images
+        image_paths = _save_slides_as_images(str(local_path))
+    return presentation, image_paths
+
+def _store_presentation_file(
+    pptx_source: Union[str, BinaryIO, bytes],
+    source_type: str
+) -> Path:
+    """Save the incoming PowerPoint file into the artifact store under its content hash"""
+    store_options = {"prefix": "presentation_", "suffix": ".pptx", "max_size": settings.MAX_UPLOAD_SIZE}
+
+    # Handle different input types and stream them to storage
     if source_type == "file_path":
-        shutil.copy2(pptx_source, storage_path)
-        presentation = Presentation(pptx_source)
+        with open(pptx_source, "rb") as stream:
+            return store_stream("decks", stream, **store_options)
     elif source_type == "upload":
-        with open(storage_path, "wb") as f:
-            if hasattr(pptx_source, "seek"):
-                pptx_source.seek(0)
-            f.write(pptx_source.read())
-        presentation = Presentation(storage_path)
+        if hasattr(pptx_source, "seek"):
+            pptx_source.seek(0)
+        return store_stream("decks", pptx_source, **store_options)
     elif source_type == "ms_graph":
-        with open(storage_path, "wb") as f:
-            f.write(pptx_source)
-        presentation = Presentation(storage_path)
+        return store_stream("decks", io.BytesIO(pptx_source), **store_options)
     else:
         raise ValueError("Invalid source_type. Must be 'file_path', 'upload', or 'ms_graph'")
 
-    # After saving the file, generate images
-    image_paths = _save_slides_as_images(str(storage_path))
-    
-    # Create metadata objects for each slide
-    slide_metadata_objects = []
-    
-    for slide_idx, (slide, image_path) in enumerate(zip(presentation.slides, image_paths)):
-        semantic_content = {
-            "title": _extract_slide_title(slide),
-            "purpose": _infer_slide_purpose(slide),
-            "category": _infer_slide_category(slide),
-            "tags": _generate_slide_tags(slide)
-        }
-        stringified_metadata = json.dumps(semantic_content)
-        embedding = await get_embedding(stringified_metadata)
-        
-        metadata = SlideMetadata(
-            title=semantic_content["title"],
-            category=semantic_content["category"],
-            slide_type=_infer_slide_type(slide),
-            purpose=semantic_content["purpose"],
-            tags=semantic_content["tags"],
-            audience=None,  # To be filled by user/AI later
-            sales_stage=None,  # To be filled by user/AI later
-            content_mapping=_create_content_mapping(slide),
-            embedding=embedding,
-            image_path=image_path,  # Add the image path
-            slide_number= slide_idx + 1
+async def _populate_slide_metadata(metadata: SlideMetadata, slide, image_path: Optional[str]) -> SlideMetadata:
+    """Fill the heuristic metadata, content mapping and embedding of a slide into a SlideMetadata row"""
+    with observe_stage("analyse_slide"):
+        for field, value in (await run_blocking(_analyse_slide, slide)).items():
+            setattr(metadata, field, value)
+
+    with observe_stage("slide_embedding"):
+        metadata.embedding = await get_embedding(semantic_text(metadata))
+
+    metadata.image_path = image_path
+    return metadata
+
+def _analyse_slide(slide) -> Dict:
+    """The heuristic metadata and content mapping of a slide, as SlideMetadata fields"""
+    return {
+        "title": _extract_slide_title(slide),
+        "purpose": _infer_slide_purpose(slide),
+        "category": _infer_slide_category(slide),
+        "tags": _generate_slide_tags(slide),
+        "slide_type": _infer_slide_type(slide),
+        "content_mapping": _create_content_mapping(slide),
+    }
+
+def _load_presentation(storage_path: str):
+    with storage.local_copy(storage_path) as local_path:
+        return Presentation(local_path)
+
+def _diff_and_render(old_storage_path: str, new_storage_path: str):
+    """Diff two stored versions of a deck and render the changed and added slides of the new one"""
+    old_slides = list(_load_presentation(old_storage_path).slides)
+    with storage.local_copy(new_storage_path) as new_local_path:
+        new_slides = list(Presentation(new_local_path).slides)
+        matched, changed, added, removed = _diff_slides(
+            [slide_fingerprint(slide) for slide in old_slides],
+            [slide_fingerprint(slide) for slide in new_slides]
         )
-        
-        slide_metadata_objects.append(metadata)
-    
-    return str(storage_path), slide_metadata_objects, image_paths
+
+        # Lazily rendered decks leave the changed and added slides without images until requested
+        to_render = [] if settings.LAZY_SLIDE_RENDERING else sorted(list(changed) + added)
+        new_image_paths = dict(zip(
+            [idx + 1 for idx in to_render],
+            _save_slides_as_images(str(new_local_path), [idx + 1 for idx in to_render]) if to_render else []
+        ))
+    return new_slides, (matched, changed, added, removed), new_image_paths
+
+async def sync_powerpoint_repository(
+    presentation: PresentationMetadata,
+    pptx_source: Union[str, BinaryIO, bytes],
+    db: Session,
+    source_type: str = "upload"
+) -> Dict[str, List[int]]:
+    """
+    Sync a stored presentation with a new version of its PowerPoint file.
+
+    Slides are diffed by fingerprint against the stored deck. Unchanged slides keep
+    their rows (only their slide_number follows a move), changed slides are re-analysed
+    in place, new slides are added and slides missing from the new version are deleted.
+    Images, shapes and embeddings are only regenerated for changed or added slides and
+    the whole diff is committed in a single transaction.
+
+    Args:
+        presentation: The PresentationMetadata row being synced
+        pptx_source: The new version of the deck (see process_powerpoint_repository)
+        db: Session: SQLAlchemy database session
+        source_type: One of "file_path", "upload", or "ms_graph"
+
+    Returns:
+        dict of slide numbers (in the new deck) per outcome, and the removed
+        slide numbers of the old deck
+    """
+    new_storage_path = await run_blocking(_store_presentation_file, pptx_source, source_type)
+    new_slides, (matched, changed, added, removed), new_image_paths = await run_blocking(
+        _diff_and_render, presentation.storage_path, new_storage_path
+    )
+
+    rows_by_number = {row.slide_number: row for row in presentation.slides}
+
+    # Replaced decks and images are left to the artifact garbage collector, since
+    # content-addressed blobs may still be referenced by other rows
+    try:
+        reindexed_rows = []
+        for new_idx, old_idx in matched.items():
+            rows_by_number[old_idx + 1].slide_number = new_idx + 1
+
+        for new_idx, old_idx in changed.items():
+            row = rows_by_number[old_idx + 1]
+            row.slide_number = new_idx + 1
+            await _populate_slide_metadata(row, new_slides[new_idx], new_image_paths.get(new_idx + 1))
+            row.shapes = await run_blocking(_extract_slide_shapes, new_slides[new_idx])
+            reindexed_rows.append(row)
+
+        for new_idx in added:
+            row = SlideMetadata(slide_number=new_idx + 1, presentation_id=presentation.id)
+            await _populate_slide_metadata(row, new_slides[new_idx], new_image_paths.get(new_idx + 1))
+            row.shapes = await run_blocking(_extract_slide_shapes, new_slides[new_idx])
+            db.add(row)
+            reindexed_rows.append(row)
+
+        for old_idx in removed:
+            db.delete(rows_by_number[old_idx + 1])
+
+        db.flush()
+        refresh_search_vectors(db, [row.id for row in reindexed_rows])
+        db.refresh(presentation)
+        first_slide = next((s for s in presentation.slides if s.slide_number == 1), None)
+        presentation.storage_path = new_storage_path
+        presentation.number_of_slides = len(new_slides)
+        presentation.image_path = first_slide.image_path if first_slide else None
+        with observe_stage("db_commit"):
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "unchanged": sorted(idx + 1 for idx in matched),
+        "changed": sorted(idx + 1 for idx in changed),
+        "added": [idx + 1 for idx in added],
+        "removed": [idx + 1 for idx in removed]
+    }
+
+def slide_fingerprint(slide) -> str:
+    """Hash the slide XML together with every part it relates to (layout, images, charts, ...)"""
+    digest = hashlib.sha256(slide.part.blob)
+    for r_id, rel in sorted(slide.part.rels.items()):
+        if rel.is_external or rel.reltype == RT.NOTES_SLIDE:
+            continue
+        digest.update(r_id.encode())
+        digest.update(rel.target_part.blob)
+    return digest.hexdigest()
+
+def _diff_slides(
+    old_fingerprints: List[str],
+    new_fingerprints: List[str]
+) -> Tuple[Dict[int, int], Dict[int, int], List[int], List[int]]:
+    """
+    Pair the slides of two versions of a deck by fingerprint (0-based indices).
+
+    Returns:
+        Tuple containing:
+            - matched: new index -> old index of identical slides (possibly moved)
+            - changed: new index -> old index of the slide at the same position that was modified
+            - added: new indices without a counterpart
+            - removed: old indices without a counterpart
+    """
+    unused_by_fingerprint = defaultdict(list)
+    for old_idx, fingerprint in enumerate(old_fingerprints):
+        unused_by_fingerprint[fingerprint].append(old_idx)
+
+    matched = {}
+    # Prefer keeping identical slides at the same position, then pick up moved ones
+    for new_idx, fingerprint in enumerate(new_fingerprints):
+        if new_idx < len(old_fingerprints) and old_fingerprints[new_idx] == fingerprint:
+            matched[new_idx] = new_idx
+            unused_by_fingerprint[fingerprint].remove(new_idx)
+    for new_idx, fingerprint in enumerate(new_fingerprints):
+        if new_idx not in matched and unused_by_fingerprint[fingerprint]:
+            matched[new_idx] = unused_by_fingerprint[fingerprint].pop(0)
+
+    unmatched_old = set(range(len(old_fingerprints))) - set(matched.values())
+    changed = {}
+    added = []
+    for new_idx in range(len(new_fingerprints)):
+        if new_idx in matched:
+            continue
+        if new_idx in unmatched_old:
+            changed[new_idx] = new_idx
+            unmatched_old.remove(new_idx)
+        else:
+            added.append(new_idx)
+
+    return matched, changed, added, sorted(unmatched_old)
 
 def _extract_slide_title(slide) -> str:
     """Extract the title from a slide"""
@@ -120,7 +294,7 @@ def _infer_slide_category(slide) -> str:
         return "data_visualization"
     
     # Check for tables
-    if any(hasattr(shape, "table") for shape in slide.shapes):
+    if any(getattr(shape, "has_table", False) for shape in slide.shapes):
         return "data_presentation"
     
     # Check for multiple images
@@ -144,7 +318,7 @@ def _infer_slide_type(slide) -> str:
     if any(shape.shape_type == MSO_SHAPE_TYPE.CHART for shape in slide.shapes):
         return "chart_slide"
     
-    if any(hasattr(shape, "table") for shape in slide.shapes):
+    if any(getattr(shape, "has_table", False) for shape in slide.shapes):
         return "table_slide"
     
     if any(shape.shape_type == MSO_SHAPE_TYPE.PICTURE for shape in slide.shapes):
@@ -180,7 +354,7 @@ def _generate_slide_tags(slide) -> List[str]:
     for shape in slide.shapes:
         if shape.shape_type == MSO_SHAPE_TYPE.CHART:
             content_types.add("chart")
-        elif hasattr(shape, "table"):
+        elif getattr(shape, "has_table", False):
             content_types.add("table")
         elif shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
             content_types.add("picture")
@@ -191,17 +365,43 @@ def _generate_slide_tags(slide) -> List[str]:
     
     return tags
 
+CONTENT_MAPPING_PROFILES = ("minimal", "standard", "full")  # Increasing detail, each a superset of the one before
+
+def mapping_profile(content_mapping: Optional[Dict]) -> Optional[str]:
+    """The profile a stored content_mapping was extracted with; mappings from before profiles are full"""
+    if content_mapping is None:
+        return None
+    return content_mapping.get("profile", "full")
+
+def slide_content_mapping(storage_path: str, slide_number: int, profile: str) -> Dict:
+    """The content_mapping of one slide of a stored deck, extracted with the given profile"""
+    slides = _load_presentation(storage_path).slides
+    if not 1 <= slide_number <= len(slides):
+        raise ValueError(f"The deck has no slide {slide_number}")
+    return _create_content_mapping(slides[slide_number - 1], profile)
+
 #TODO: This is a placeholder function to create a content object/schema for the slides.
-def _create_content_mapping(slide) -> Dict:
+def _create_content_mapping(slide, profile: Optional[str] = None) -> Dict:
     """
     Create comprehensive content object for a given slide.
     
     Args:
         slide (Slide): The slide to create a content object for
+        profile: How much detail to extract, settings.CONTENT_MAPPING_PROFILE by default:
+            - "minimal": layout, and per shape its position, placeholder, kind and plain
+              paragraph text, table dimensions, chart type and title
+            - "standard": also paragraph level and alignment, text frame settings, table
+              cell text, chart categories and series names, fills and background
+            - "full": also run fonts, table cell sizes and chart series values
     
     Returns:
-        dict: Dictionary containing the content object for the slide
+        dict: Dictionary containing the content object for the slide, with the profile it
+        was extracted with under "profile"
     """
+    profile = profile or settings.CONTENT_MAPPING_PROFILE
+    detail = CONTENT_MAPPING_PROFILES.index(profile)
+    standard, full = detail >= 1, detail >= 2
+
     # Get placeholder type names for better readability
     placeholder_types = {
         getattr(PP_PLACEHOLDER, attr): attr 
@@ -220,6 +420,7 @@ def _create_content_mapping(slide) -> Dict:
     schema = {
         "slide_id": slide.slide_id,
         "layout_name": slide.slide_layout.name,
+        "profile": profile,
         "elements": []
     }
     
@@ -258,15 +459,15 @@ def _create_content_mapping(slide) -> Dict:
             # Get text and formatting at paragraph level
             paragraphs_data = []
             for p in shape.text_frame.paragraphs:
-                paragraph_data = {
-                    "text": p.text,
-                    "level": p.level,
-                    "alignment": str(p.alignment) if hasattr(p, 'alignment') else None,
-                    "runs": []
-                }
+                paragraph_data = {"text": p.text}
+                if standard:
+                    paragraph_data["level"] = p.level
+                    paragraph_data["alignment"] = str(p.alignment) if hasattr(p, 'alignment') else None
+                if full:
+                    paragraph_data["runs"] = []
                 
                 # Get formatting for each text run
-                for run in p.runs:
+                for run in (p.runs if full else ()):
                     run_data = {
                         "text": run.text,
                         "font": {
@@ -283,39 +484,42 @@ def _create_content_mapping(slide) -> Dict:
                 paragraphs_data.append(paragraph_data)
             
             element["paragraphs"] = paragraphs_data
-            element["has_text_linking"] = shape.text_frame.auto_size
-            element["word_wrap"] = shape.text_frame.word_wrap
-            element["vertical_anchor"] = str(shape.text_frame.vertical_anchor) if hasattr(shape.text_frame, 'vertical_anchor') else None
+            if standard:
+                element["has_text_linking"] = shape.text_frame.auto_size
+                element["word_wrap"] = shape.text_frame.word_wrap
+                element["vertical_anchor"] = str(shape.text_frame.vertical_anchor) if hasattr(shape.text_frame, 'vertical_anchor') else None
         
         # Table content
-        elif hasattr(shape, 'table'):
+        elif getattr(shape, 'has_table', False):
             element["content_type"] = "table"
             table_data = []
             
-            for r_idx, row in enumerate(shape.table.rows):
+            for r_idx, row in enumerate(shape.table.rows if standard else ()):
                 row_data = []
                 for c_idx, cell in enumerate(row.cells):
                     cell_data = {
                         "text": cell.text,
                         "row_idx": r_idx,
-                        "col_idx": c_idx,
-                        "width": shape.table.columns[c_idx].width,
-                        "height": shape.table.rows[r_idx].height
+                        "col_idx": c_idx
                     }
+                    if full:
+                        cell_data["width"] = shape.table.columns[c_idx].width
+                        cell_data["height"] = shape.table.rows[r_idx].height
                     row_data.append(cell_data)
                 table_data.append(row_data)
             
-            element["table_data"] = table_data
+            if standard:
+                element["table_data"] = table_data
             element["row_count"] = len(shape.table.rows)
             element["column_count"] = len(shape.table.columns)
         
         # Chart content
-        elif hasattr(shape, 'chart'):
+        elif getattr(shape, 'has_chart', False):
             element["content_type"] = "chart"
             element["chart_type"] = str(shape.chart.chart_type)
             
             # Extract categories and series
-            if hasattr(shape.chart, 'plots') and shape.chart.plots:
+            if standard and hasattr(shape.chart, 'plots') and shape.chart.plots:
                 plot = shape.chart.plots[0]
                 
                 # Try to get categories
@@ -329,10 +533,9 @@ def _create_content_mapping(slide) -> Dict:
                 series_data = []
                 if hasattr(plot, 'series'):
                     for series in plot.series:
-                        series_info = {
-                            "name": series.name if hasattr(series, 'name') else "Unknown",
-                            "values": list(series.values) if hasattr(series, 'values') else []
-                        }
+                        series_info = {"name": series.name if hasattr(series, 'name') else "Unknown"}
+                        if full:
+                            series_info["values"] = list(series.values) if hasattr(series, 'values') else []
                         series_data.append(series_info)
                 element["series"] = series_data
             
@@ -351,7 +554,7 @@ def _create_content_mapping(slide) -> Dict:
         # Shape content
         else:
             element["content_type"] = "shape"
-            if hasattr(shape, 'fill'):
+            if standard and hasattr(shape, 'fill'):
                 element["fill_type"] = str(shape.fill.type) if hasattr(shape.fill, 'type') else None
                 if hasattr(shape.fill, 'fore_color') and shape.fill.fore_color:
                     element["fill_color"] = str(shape.fill.fore_color.rgb) if hasattr(shape.fill.fore_color, 'rgb') else None
@@ -361,7 +564,7 @@ def _create_content_mapping(slide) -> Dict:
     
     # Add background information
     try:
-        if hasattr(slide, 'background') and slide.background:
+        if standard and hasattr(slide, 'background') and slide.background:
             if hasattr(slide.background, 'fill'):
                 fill_type = type(slide.background.fill._fill).__name__
                 schema["background_fill_type"] = fill_type
@@ -376,101 +579,135 @@ def _create_content_mapping(slide) -> Dict:
     
     return schema
 
-def _save_slides_as_images(pptx_path: str) -> list[str]:
+def _save_slides_as_images(pptx_path: str, slide_numbers: Optional[List[int]] = None) -> list[str]:
     """
     Convert each slide in the PowerPoint to an image and save it.
     Uses LibreOffice to convert to PDF first, then pdf2image to convert to images.
+    When slide_numbers (1-based) is given, only those pages are rasterized and the
+    image paths are returned in the same order.
     """
-    # Create images directory if it doesn't exist
-    images_dir = Path("images")
-    images_dir.mkdir(exist_ok=True)
-    
     # Create a temporary directory for the PDF
     with tempfile.TemporaryDirectory() as temp_dir:
         temp_dir_path = Path(temp_dir)
-        pdf_path = temp_dir_path / "slides.pdf"
-        
-        # Convert PPTX to PDF using LibreOffice
         try:
-            # Get absolute paths
-            pptx_abs_path = str(Path(pptx_path).absolute())
-            temp_dir_abs_path = str(temp_dir_path.absolute())
-            
-            # Try using libreoffice with absolute paths
-            result = subprocess.run([
-                'libreoffice',
-                '--headless',
-                '--convert-to', 'pdf',
-                '--outdir', temp_dir_abs_path,
-                pptx_abs_path
-            ], capture_output=True, text=True, check=False)
-            
-            if result.returncode != 0:
-                print(f"LibreOffice Error: {result.stderr}")
-                # Try soffice as fallback
-                result = subprocess.run([
-                    'soffice',
-                    '--headless',
-                    '--convert-to', 'pdf',
-                    '--outdir', temp_dir_abs_path,
-                    pptx_abs_path
-                ], capture_output=True, text=True, check=False)
-                
-                if result.returncode != 0:
-                    print(f"Soffice Error: {result.stderr}")
-                    raise RuntimeError(
-                        f"Failed to convert PPTX to PDF. LibreOffice/Soffice error: {result.stderr}"
-                    )
-            
-            # Verify PDF was created
-            expected_pdf = temp_dir_path / Path(pptx_path).with_suffix('.pdf').name
-            if not expected_pdf.exists():
-                raise RuntimeError(f"PDF file not created at expected location: {expected_pdf}")
-            
-            # Move the PDF to the expected location
-            shutil.move(str(expected_pdf), str(pdf_path))
-            
-            # Convert PDF to images
-            images = convert_from_path(str(pdf_path))
-            image_paths = []
-            
-            # Save each image
-            for i, image in enumerate(images):
-                image_filename = f"slide_{uuid.uuid4()}.jpg"
-                image_path = images_dir / image_filename
-                image.save(str(image_path), "JPEG")
-                image_paths.append(str(image_path))
-            
-            return image_paths
-            
+            pdf_path = convert_to_pdf(pptx_path, temp_dir_path)
+            return rasterize_pdf(pdf_path, slide_numbers)
         except Exception as e:
-            print(f"Error during conversion: {str(e)}")
+            logger.error("Error during conversion: %s", e)
             raise RuntimeError(f"Failed to process slides: {str(e)}")
+
+def convert_to_pdf(pptx_path: str, output_dir: Path) -> Path:
+    """Convert a deck to PDF with LibreOffice, returning output_dir / "slides.pdf" """
+    pdf_path = output_dir / "slides.pdf"
+
+    # Get absolute paths
+    pptx_abs_path = str(Path(pptx_path).absolute())
+    output_abs_path = str(output_dir.absolute())
+
+    # Try using libreoffice with absolute paths
+    render_started = time.perf_counter()
+    # A profile per conversion, since conversions now run concurrently on the document
+    # executor and LibreOffice refuses to share a profile between processes
+    profile = f"-env:UserInstallation={(output_dir / 'profile').absolute().as_uri()}"
+    result = subprocess.run([
+        'libreoffice',
+        profile,
+        '--headless',
+        '--convert-to', 'pdf',
+        '--outdir', output_abs_path,
+        pptx_abs_path
+    ], capture_output=True, text=True, check=False)
+
+    if result.returncode != 0:
+        logger.warning("LibreOffice Error: %s", result.stderr)
+        # Try soffice as fallback
+        result = subprocess.run([
+            'soffice',
+            profile,
+            '--headless',
+            '--convert-to', 'pdf',
+            '--outdir', output_abs_path,
+            pptx_abs_path
+        ], capture_output=True, text=True, check=False)
+
+        if result.returncode != 0:
+            logger.error("Soffice Error: %s", result.stderr)
+            raise RuntimeError(
+                f"Failed to convert PPTX to PDF. LibreOffice/Soffice error: {result.stderr}"
+            )
+    STAGE_LATENCY.labels(stage="libreoffice_render").observe(time.perf_counter() - render_started)
+
+    # Verify PDF was created
+    expected_pdf = output_dir / Path(pptx_path).with_suffix('.pdf').name
+    if not expected_pdf.exists():
+        raise RuntimeError(f"PDF file not created at expected location: {expected_pdf}")
+
+    # Move the PDF to the expected location
+    shutil.move(str(expected_pdf), str(pdf_path))
+    return pdf_path
+
+def rasterize_pdf(
+    pdf_path: Path,
+    slide_numbers: Optional[List[int]] = None,
+    kind: str = "images",
+    size: Optional[Tuple[int, Optional[int]]] = None
+) -> list[str]:
+    """
+    Store pages of a rendered deck (all, or slide_numbers in that order) as slide images
+    of the given artifact kind, scaled to size (width, height) when given.
+    """
+    with observe_stage("pdf_rasterize"):
+        if slide_numbers is None:
+            images = convert_from_path(str(pdf_path), size=size)
+        else:
+            images = [
+                convert_from_path(str(pdf_path), first_page=number, last_page=number, size=size)[0]
+                for number in slide_numbers
+            ]
+    image_paths = []
+
+    # Save each image
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for i, image in enumerate(images):
+            temp_image_path = Path(temp_dir) / f"slide_{i}.jpg"
+            image.save(str(temp_image_path), "JPEG")
+            image_paths.append(store_file(kind, temp_image_path, prefix="slide_", suffix=".jpg"))
+
+    return image_paths
         
 
-def retrieve_shape_and_content(pptx_storage_path: str):
-  
-    prs = Presentation(pptx_storage_path)
+def retrieve_shape_and_content(pptx_storage_path: str, slide_metadata_ids: Optional[List[int]] = None):
+    """
+    Extract the text of every shape paragraph of a deck as SlideShape rows.
+    slide_metadata_ids holds the SlideMetadata id of each slide in deck order; without
+    it the rows are linked by slide number.
+    """
+    with storage.local_copy(pptx_storage_path) as local_path, observe_stage("extract_shapes"):
+        prs = Presentation(local_path)
+
+        shapes_to_insert = []  # all my shapes
+        for slide_index, slide in enumerate(prs.slides, start=1):
+          slide_metadata_id = slide_metadata_ids[slide_index - 1] if slide_metadata_ids else slide_index
+          shapes_to_insert.extend(_extract_slide_shapes(slide, slide_metadata_id))
+    return shapes_to_insert
 
-    shapes_to_insert = []  # all my shapes
-    for slide_index, slide in enumerate(prs.slides, start=1):
-      for shape_index, shape in enumerate(slide.shapes, start=1):
+def _extract_slide_shapes(slide, slide_metadata_id: Optional[int] = None) -> List[SlideShape]:
+    """Create a SlideShape row for every paragraph of every text-bearing shape of a slide"""
+    shapes = []
+    for shape_index, shape in enumerate(slide.shapes, start=1):
       
-          shape_type_id = shape.shape_type  # Gets shape type ID
-          shape_type_name = MSO_SHAPE_TYPE(shape_type_id).name if shape_type_id in MSO_SHAPE_TYPE.__members__.values() else f"Unknown ({shape_type_id})"
-
-          if hasattr(shape, "text_frame") and shape.text_frame is not None:
-              for paragraph in shape.text_frame.paragraphs:
-                  full_text = paragraph.text.strip()  # Extract full text from paragraph
-                  print(f"Slide {slide_index}, Shape {shape_index} [{shape_type_name}]: {full_text}")
-                  new_shape = SlideShape(
-                      slide_metadata_id=slide_index,
-                      shape_index=shape_index,
-                      shape_type=shape_type_name,
-                      text_content=full_text
-                     )
-                  shapes_to_insert.append(new_shape)
-    if shapes_to_insert:
-      return shapes_to_insert
-    else:
-        return None
\ No newline at end of file
+        shape_type_id = shape.shape_type  # Gets shape type ID
+        shape_type_name = MSO_SHAPE_TYPE(shape_type_id).name if shape_type_id in MSO_SHAPE_TYPE.__members__.values() else f"Unknown ({shape_type_id})"
+
+        if hasattr(shape, "text_frame") and shape.text_frame is not None:
+            for paragraph in shape.text_frame.paragraphs:
+                full_text = paragraph.text.strip()  # Extract full text from paragraph
+                logger.debug("Slide %s, Shape %s [%s]: %s", slide_metadata_id, shape_index, shape_type_name, full_text)
+                new_shape = SlideShape(
+                    slide_metadata_id=slide_metadata_id,
+                    shape_index=shape_index,
+                    shape_type=shape_type_name,
+                    text_content=full_text
+                   )
+                shapes.append(new_shape)
+    return shapes
@@ -0,0 +1,166 @@
+"""
+Thumbnail previews of generated presentations.
+
+When asked for, previews are produced in the background after the deck has been returned.
+Thumbnails and a JSON manifest named after the output artifact are stored under
+presentation_previews/, and are collected with the outputs. The manifest is written as
+"pending" before the response is sent, so any API node can report progress; a pending
+manifest older than PREVIEW_PENDING_TIMEOUT_SECONDS belongs to a node that stopped
+rendering and is treated as failed. An output slide whose XML
+and related parts are identical to the template slide it came from (none of its text was
+replaced, e.g. a degraded slide) reuses that slide's existing render. The other slides
+are rendered from the output deck through LibreOffice, only the pages needed.
+"""
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image
+from pptx import Presentation
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.models import PresentationMetadata, SlideMetadata
+from app.utils.artifact_store import artifact_key, store_file
+from app.utils.blocking import run_blocking
+from app.utils.metrics import CACHE_EVENTS
+from app.utils.pptx_parsing import convert_to_pdf, rasterize_pdf, slide_fingerprint
+from app.utils.result_cache import GeneratedPresentation
+from app.utils.storage import spooled_file, storage
+
+logger = logging.getLogger(__name__)
+
+_pending: Dict[str, asyncio.Task] = {}  # Output artifact key -> preview job
+
+
+def preview_manifest_key(output_key: str) -> str:
+    return artifact_key("previews", f"{Path(output_key).stem}.json")
+
+
+async def schedule_previews(result: GeneratedPresentation):
+    """
+    Start producing the previews of a generated presentation, unless they exist or are
+    underway; failed ones are retried. Returns once the pending manifest is stored.
+    """
+    output_key = result.artifact_key
+    if output_key in _pending:
+        return
+    claimed = asyncio.Event()
+    task = asyncio.create_task(_produce_previews(result, claimed))
+    _pending[output_key] = task
+    task.add_done_callback(lambda _: _pending.pop(output_key, None))
+    await claimed.wait()
+
+
+def read_preview_manifest(output_key: str) -> Optional[dict]:
+    """The stored manifest, with a pending one that was abandoned reported as failed"""
+    manifest_key = preview_manifest_key(output_key)
+    if not storage.exists(manifest_key):
+        return None
+    manifest = json.loads(b"".join(storage.iter_read(manifest_key)))
+    if manifest["status"] == "pending" \
+            and time.time() - manifest["started_at"] > settings.PREVIEW_PENDING_TIMEOUT_SECONDS:
+        manifest = {"output": output_key, "status": "failed", "error": "Rendering the previews was interrupted"}
+    return manifest
+
+
+async def _produce_previews(result: GeneratedPresentation, claimed: asyncio.Event):
+    try:
+        manifest = await run_blocking(read_preview_manifest, result.artifact_key)
+        if manifest is not None and manifest["status"] != "failed":
+            return  # Ready, or being rendered by another node
+        await run_blocking(_write_manifest, result.artifact_key, {"status": "pending", "started_at": time.time()})
+    except Exception:
+        logger.exception("Scheduling previews of %s failed", result.artifact_key)
+        return
+    finally:
+        claimed.set()
+
+    try:
+        template_images = await run_blocking(_template_images, result)
+        manifest = await run_blocking(
+            _render_previews, result.artifact_key, result.template_key, result.template_slides, template_images
+        )
+    except Exception as e:
+        logger.exception("Rendering previews of %s failed", result.artifact_key)
+        manifest = {"status": "failed", "error": str(e)}
+    await run_blocking(_write_manifest, result.artifact_key, manifest)
+
+
+def _template_images(result: GeneratedPresentation) -> Dict[int, str]:
+    """The existing renders of the template slides the presentation was built from, by slide number"""
+    if not result.template_key:
+        return {}
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(SlideMetadata.slide_number, SlideMetadata.image_path)
+            .join(PresentationMetadata)
+            .filter(
+                PresentationMetadata.storage_path == result.template_key,
+                SlideMetadata.slide_number.in_(result.template_slides),
+                SlideMetadata.image_path.isnot(None)
+            )
+            .all()
+        )
+    finally:
+        db.close()
+    return dict(rows)
+
+
+def _render_previews(
+    output_key: str,
+    template_key: Optional[str],
+    template_slides: List[int],
+    template_images: Dict[int, str]
+) -> dict:
+    with storage.local_copy(output_key) as output_path:
+        output_slides = list(Presentation(output_path).slides)
+
+        reusable = {}
+        if template_images:
+            with storage.local_copy(template_key) as template_path:
+                template = list(Presentation(template_path).slides)
+            for position, (slide, number) in enumerate(zip(output_slides, template_slides), start=1):
+                if number in template_images and number <= len(template) \
+                        and slide_fingerprint(slide) == slide_fingerprint(template[number - 1]):
+                    reusable[position] = template_images[number]
+
+        to_render = [position for position in range(1, len(output_slides) + 1) if position not in reusable]
+        thumbnails = {position: _thumbnail(image_path) for position, image_path in reusable.items()}
+        if to_render:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                pdf_path = convert_to_pdf(str(output_path), Path(temp_dir))
+                thumbnails.update(zip(
+                    to_render,
+                    rasterize_pdf(pdf_path, to_render, kind="previews", size=(settings.PREVIEW_WIDTH, None))
+                ))
+
+    CACHE_EVENTS.labels(cache="preview_render", outcome="hit").inc(len(reusable))
+    CACHE_EVENTS.labels(cache="preview_render", outcome="miss").inc(len(to_render))
+    return {
+        "status": "ready",
+        "slides": [
+            {"position": position, "image_key": thumbnails[position], "reused": position in reusable}
+            for position in sorted(thumbnails)
+        ],
+    }
+
+
+def _thumbnail(image_path: str) -> str:
+    """A preview-sized copy of an existing slide render"""
+    with storage.local_copy(image_path) as source_path, Image.open(source_path) as image:
+        image.thumbnail((settings.PREVIEW_WIDTH, image.height))
+        with spooled_file(".jpg") as thumbnail_path:
+            image.convert("RGB").save(thumbnail_path, "JPEG")
+            return store_file("previews", thumbnail_path, prefix="slide_", suffix=".jpg")
+
+
+def _write_manifest(output_key: str, manifest: dict):
+    with spooled_file(".json") as manifest_path:
+        manifest_path.write_text(json.dumps({"output": output_key, **manifest}))
+        storage.put_file(preview_manifest_key(output_key), manifest_path)
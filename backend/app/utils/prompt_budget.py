@@ -0,0 +1,146 @@
+"""
+Token-budgeted prompts for slide rewriting.
+
+Each rewrite prompt carries the outline section the slide was matched to and a compact
+summary of the presentation input, instead of the whole outline and input. Prompts are
+measured with a local tokenizer (tiktoken when installed and its encoding loads,
+otherwise an estimate of four characters per token) and the optional context is trimmed until the prompt fits
+REWRITE_PROMPT_TOKEN_BUDGET. The slide text itself is never trimmed, since its strings
+are the keys of the rewrite mapping.
+"""
+import json
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+from app.config import settings
+from app.schemas import schemas
+from app.utils.metrics import PROMPT_TOKENS, PROMPT_TOKENS_SAVED
+
+try:
+    import tiktoken
+except ImportError:  # Optional: token counts are estimated without it
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+_CHARS_PER_TOKEN = 4
+
+REWRITE_INSTRUCTIONS = """Rewrite the text provided while keeping its meaning intact but have fun with it!
+Don't be afraid to be creative and add a bit of flair to make it more engaging, interesting and
+different from the original text."""
+
+REWRITE_OUTPUT_FORMAT = """### Output Format (JSON)
+Return a JSON object where each key is the original text and each value is the rewritten text:
+{"Original Text 1": "Rewritten Text 1", "Original Text 2": "Rewritten Text 2"}"""
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """The model's tiktoken encoding, None when tiktoken is not installed or cannot load it"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # The encoding files are downloaded on first use, which fails on hosts without egress
+        logger.warning("Could not load the tiktoken encoding for %s, estimating token counts", model, exc_info=True)
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Tokens in text for the completion model, estimated when tiktoken is unavailable"""
+    encoding = _encoding(model or settings.COMPLETION_MODEL)
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+
+def input_summary(presentation_input: schemas.PresentationInput, detail: int = 2) -> str:
+    """
+    The presentation input as a few labelled lines. detail 2 is everything, 1 shortens the
+    description and drops the additional context, 0 keeps only who and what it is for.
+    """
+    lines = [
+        f"Title: {presentation_input.title}",
+        f"Client: {presentation_input.client_name} ({presentation_input.industry})",
+        f"Audience: {presentation_input.target_audience}",
+        f"Tone: {presentation_input.tone or 'Professional'}",
+    ]
+    if detail >= 1:
+        lines.append(f"Key messages: {'; '.join(presentation_input.key_messages)}")
+        description = presentation_input.description if detail >= 2 else _truncate(presentation_input.description, 200)
+        lines.append(f"Description: {description}")
+    if detail >= 2 and presentation_input.additional_context:
+        lines.append(f"Additional context: {presentation_input.additional_context}")
+    return "\n".join(lines)
+
+
+def section_summary(section: schemas.SlideOutline, with_keywords: bool = True) -> str:
+    summary = f"{section.section}: {section.description}"
+    if with_keywords and section.keywords:
+        summary += f" (keywords: {', '.join(section.keywords)})"
+    return summary
+
+
+def _render(guide: str, summary: str, slide_content: dict) -> str:
+    return (
+        f"{REWRITE_INSTRUCTIONS}\n\n"
+        f"### This slide's purpose in the outline\n{guide}\n\n"
+        f"### About the presentation\n{summary}\n\n"
+        f"### Original Slide Content\n{json.dumps(slide_content, ensure_ascii=False)}\n\n"
+        f"{REWRITE_OUTPUT_FORMAT}"
+    )
+
+
+def _full_context_prompt(
+    outline: List[schemas.SlideOutline],
+    presentation_input: schemas.PresentationInput,
+    slide_content: dict
+) -> str:
+    """The prompt with the whole outline and input, as every slide used to get; the baseline for savings"""
+    return f"{REWRITE_INSTRUCTIONS}\n{outline}\n{presentation_input}\n{json.dumps(slide_content, indent=4)}\n{REWRITE_OUTPUT_FORMAT}"
+
+
+def build_rewrite_prompt(
+    slide: dict,
+    section: Optional[schemas.SlideOutline],
+    outline: List[schemas.SlideOutline],
+    presentation_input: schemas.PresentationInput,
+    budget: Optional[int] = None
+) -> str:
+    """
+    The rewrite prompt for one slide ({"slideNumber", "text"}), within budget tokens if the
+    slide text allows. Without a matched section, every section of the outline is listed briefly.
+    """
+    budget = budget or settings.REWRITE_PROMPT_TOKEN_BUDGET
+    slide_content = {"slideNumber": slide.get("slideNumber"), "text": slide["text"]}
+
+    def guide(with_keywords: bool) -> str:
+        if section is not None:
+            return section_summary(section, with_keywords)
+        return "\n".join(section_summary(s, with_keywords=False) for s in outline)
+
+    # Cheapest context last: shorter input summary, then no keywords, then the bare minimum
+    for detail, with_keywords in ((2, True), (1, True), (1, False), (0, False)):
+        prompt = _render(guide(with_keywords), input_summary(presentation_input, detail), slide_content)
+        tokens = count_tokens(prompt)
+        if tokens <= budget:
+            PROMPT_TOKENS.labels(operation="rewrite", outcome="within_budget").observe(tokens)
+            break
+    else:
+        PROMPT_TOKENS.labels(operation="rewrite", outcome="over_budget").observe(tokens)
+        logger.warning("Rewrite prompt for slide %s is %d tokens, over the budget of %d",
+                       slide.get("slideNumber"), tokens, budget)
+
+    PROMPT_TOKENS_SAVED.labels(operation="rewrite").inc(
+        max(0, count_tokens(_full_context_prompt(outline, presentation_input, slide_content)) - tokens)
+    )
+    return prompt
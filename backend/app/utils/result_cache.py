@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import PresentationMetadata, SlideMetadata
+from app.schemas import schemas
+from app.utils.deadline import DeadlineExceeded, remaining_time
+from app.utils.embedding_model import active_embedding_model
+from app.utils.metrics import CACHE_EVENTS
+from app.utils.storage import storage
+
+
+@dataclass(frozen=True)
+class GeneratedPresentation:
+    artifact_key: str
+    degraded_slides: List[int] = field(default_factory=list)  # Positions (from 1) of slides that kept their original text
+    template_key: Optional[str] = None  # The deck the presentation was built from
+    template_slides: List[int] = field(default_factory=list)  # Its slide numbers, in output order
+
+
+def repository_version(db: Session) -> str:
+    """
+    A fingerprint of the slide library that changes whenever slides are added,
+    removed or updated, so cached presentations never outlive the library they were built from.
+    """
+    slides = db.query(
+        func.count(SlideMetadata.id),
+        func.max(SlideMetadata.id),
+        func.max(SlideMetadata.created_at),
+        func.max(SlideMetadata.updated_at)
+    ).one()
+    presentations = db.query(
+        func.count(PresentationMetadata.id),
+        func.max(PresentationMetadata.id)
+    ).one()
+    return json.dumps([*map(str, slides), *map(str, presentations)])
+
+
+def presentation_cache_key(input_data: schemas.PresentationInput, version: str) -> str:
+    """Canonical hash of a generation request, the library version and the model settings"""
+    payload = {
+        "input": input_data.model_dump(mode="json"),
+        "repository_version": version,
+        "models": {
+            "embedding": list(active_embedding_model()),
+            "outline": settings.OUTLINE_MODEL,
+            "completion": settings.COMPLETION_MODEL,
+        },
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class PresentationResultCache:
+    """
+    Maps request cache keys to generated presentation artifacts and coalesces identical
+    concurrent requests (single-flight): only the first caller runs the generation,
+    the others wait for its result, for no longer than their own deadline. Degraded results
+    are neither cached nor shared: the leader may have had a shorter deadline than its
+    waiters, so they generate their own instead.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[GeneratedPresentation, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced_waits = 0
+
+    def _lookup(self, cache_key: str) -> Optional[GeneratedPresentation]:
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None
+        result, created_at = entry
+        # Outputs expire from the artifact store after their TTL, so the cached key may be dangling
+        if time.time() - created_at > self.ttl_seconds or not storage.exists(result.artifact_key):
+            del self._entries[cache_key]
+            return None
+        self._entries.move_to_end(cache_key)
+        return result
+
+    def _store(self, cache_key: str, result: GeneratedPresentation):
+        self._entries[cache_key] = (result, time.time())
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_create(
+        self,
+        cache_key: str,
+        factory: Callable[[], Awaitable[GeneratedPresentation]]
+    ) -> GeneratedPresentation:
+        """Return the cached presentation for cache_key, generating it with factory at most once at a time"""
+        while True:
+            result = self._lookup(cache_key)
+            if result is not None:
+                self.hits += 1
+                CACHE_EVENTS.labels(cache="presentation", outcome="hit").inc()
+                return result
+
+            inflight = self._inflight.get(cache_key)
+            if inflight is None:
+                break
+
+            self.coalesced_waits += 1
+            CACHE_EVENTS.labels(cache="presentation", outcome="coalesced").inc()
+            try:
+                result = await asyncio.wait_for(asyncio.shield(inflight), remaining_time())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("coalesced generation") from None
+            except asyncio.CancelledError:
+                if inflight.cancelled():
+                    continue  # The leading request went away, so one of the waiters takes over
+                raise
+            if not result.degraded_slides:
+                return result
+
+        self.misses += 1
+        CACHE_EVENTS.labels(cache="presentation", outcome="miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved, waiters (if any) re-raise it themselves
+            raise
+        else:
+            if not result.degraded_slides:
+                self._store(cache_key, result)
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[cache_key]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced_waits": self.coalesced_waits,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+        }
+
+
+presentation_cache = PresentationResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.OUTPUT_TTL_SECONDS,
+)
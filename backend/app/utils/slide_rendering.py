@@ -0,0 +1,112 @@
+"""
+On-demand slide images (LAZY_SLIDE_RENDERING).
+
+With lazy rendering, ingestion records a deck's slides without images. The first request
+for a slide's image converts the whole deck to PDF once, caches the PDF in the artifact
+store under the deck's name, rasterizes only the requested pages and records their image
+paths. The RENDER_PREFETCH_SLIDES slides on either side are then rendered in the
+background, since slides are usually looked at in order.
+
+Renders of one deck are serialized, so concurrent requests never convert a deck twice
+and a slide is rasterized at most once.
+"""
+import asyncio
+import logging
+import tempfile
+import weakref
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.models import PresentationMetadata, SlideMetadata
+from app.utils.artifact_store import deck_render_key
+from app.utils.blocking import run_blocking
+from app.utils.metrics import CACHE_EVENTS
+from app.utils.pptx_parsing import convert_to_pdf, rasterize_pdf
+from app.utils.storage import storage
+
+logger = logging.getLogger(__name__)
+
+_deck_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+_prefetches: Set[asyncio.Task] = set()  # Referenced until done, so they are not garbage collected
+
+
+def _deck_lock(deck_key: str) -> asyncio.Lock:
+    lock = _deck_locks.get(deck_key)
+    if lock is None:
+        lock = _deck_locks[deck_key] = asyncio.Lock()
+    return lock
+
+
+def _render_pages(deck_key: str, slide_numbers: List[int]) -> List[str]:
+    """Rasterize slide_numbers of a stored deck, converting it to PDF unless a cached PDF exists"""
+    pdf_key = deck_render_key(deck_key)
+    if storage.exists(pdf_key):
+        CACHE_EVENTS.labels(cache="deck_render", outcome="hit").inc()
+    else:
+        CACHE_EVENTS.labels(cache="deck_render", outcome="miss").inc()
+        with storage.local_copy(deck_key) as deck_path, tempfile.TemporaryDirectory() as temp_dir:
+            storage.put_file(pdf_key, convert_to_pdf(str(deck_path), Path(temp_dir)))
+
+    with storage.local_copy(pdf_key) as pdf_path:
+        return rasterize_pdf(Path(pdf_path), slide_numbers)
+
+
+async def render_slides(
+    db: Session,
+    presentation: PresentationMetadata,
+    slide_numbers: List[int]
+) -> Dict[int, Optional[str]]:
+    """
+    The image paths of slide_numbers of a presentation, rendering the slides that have none.
+    Slide numbers the presentation does not have are left out.
+    """
+    async with _deck_lock(presentation.storage_path):
+        # Reloaded under the lock, as another request may have just rendered them
+        slides = (
+            db.query(SlideMetadata)
+            .filter(SlideMetadata.presentation_id == presentation.id, SlideMetadata.slide_number.in_(slide_numbers))
+            .populate_existing()
+            .all()
+        )
+        missing = sorted(slide.slide_number for slide in slides if not slide.image_path)
+        CACHE_EVENTS.labels(cache="slide_render", outcome="hit").inc(len(slides) - len(missing))
+        if missing:
+            CACHE_EVENTS.labels(cache="slide_render", outcome="miss").inc(len(missing))
+            image_paths = dict(zip(missing, await run_blocking(_render_pages, presentation.storage_path, missing)))
+            for slide in slides:
+                if slide.slide_number in image_paths:
+                    slide.image_path = image_paths[slide.slide_number]
+            if 1 in image_paths and not presentation.image_path:
+                presentation.image_path = image_paths[1]
+            db.commit()
+    return {slide.slide_number: slide.image_path for slide in slides}
+
+
+def prefetch_neighbours(presentation: PresentationMetadata, first: int, last: int):
+    """Render the slides around first..last in the background"""
+    distance = settings.RENDER_PREFETCH_SLIDES
+    neighbours = [
+        number for number in range(first - distance, last + distance + 1)
+        if 1 <= number <= (presentation.number_of_slides or 0) and not first <= number <= last
+    ]
+    if not neighbours:
+        return
+    task = asyncio.create_task(_prefetch(presentation.id, neighbours))
+    _prefetches.add(task)
+    task.add_done_callback(_prefetches.discard)
+
+
+async def _prefetch(presentation_id: int, slide_numbers: List[int]):
+    db = SessionLocal()
+    try:
+        presentation = db.get(PresentationMetadata, presentation_id)
+        if presentation is not None:
+            await render_slides(db, presentation, slide_numbers)
+    except Exception:
+        logger.exception("Prefetching slides %s of presentation %d failed", slide_numbers, presentation_id)
+    finally:
+        db.close()
@@ -0,0 +1,146 @@
+"""
+Hybrid lexical + vector candidate retrieval for slide matching.
+
+Every slide has a tsvector (search_vector, GIN-indexed) built from its title (weight A)
+and the text of its shapes (weight B). Candidate retrieval takes the best slides by
+full-text rank and the best slides by embedding distance, unions them, and returns
+both scores for each candidate, so the caller only scores a small set in Python.
+
+When the half-precision HNSW index from migration 0004 exists (pgvector >= 0.7), the
+vector stage walks that index and the candidates are re-ranked on exact float32 distances.
+"""
+from dataclasses import dataclass
+from typing import Collection, Iterable, List, Optional
+
+import numpy as np
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import String, cast, func, select, text, union
+from sqlalchemy.dialects.postgresql import TSQUERY
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import SlideMetadata
+from app.utils.embedding_model import embedding_dimensions
+
+TS_CONFIG = "english"
+
+HALFVEC_INDEX = "ix_slide_metadata_embedding_halfvec"
+
+_halfvec_index_exists: Optional[bool] = None
+
+# Keep in sync with the backfill in alembic/versions/0002_slide_search_vector.py
+_REFRESH_SEARCH_VECTORS = text("""
+    UPDATE slide_metadata
+    SET search_vector =
+        setweight(to_tsvector(CAST(:config AS regconfig), coalesce(slide_metadata.title, '')), 'A') ||
+        setweight(to_tsvector(CAST(:config AS regconfig), coalesce((
+            SELECT string_agg(slide_shapes.text_content, ' ')
+            FROM slide_shapes
+            WHERE slide_shapes.slide_metadata_id = slide_metadata.id
+        ), '')), 'B')
+    WHERE slide_metadata.id = ANY(:ids)
+""")
+
+
+@dataclass
+class SlideCandidate:
+    slide: SlideMetadata
+    similarity: float  # Cosine similarity between the query and slide embeddings
+    lexical_rank: float  # Full-text rank normalised to [0, 1), 0 when no query term matches
+
+
+def supports_full_text_search(db: Session) -> bool:
+    bind = db.get_bind()
+    return bind is not None and bind.dialect.name == "postgresql"
+
+
+def halfvec_search_enabled(db: Session) -> bool:
+    """Whether the vector stage can use the half-precision index (looked up once per process)"""
+    global _halfvec_index_exists
+    if not settings.EMBEDDING_HALFVEC_SEARCH:
+        return False
+    if _halfvec_index_exists is None:
+        _halfvec_index_exists = bool(db.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = :name)"),
+            {"name": HALFVEC_INDEX}
+        ).scalar())
+    return _halfvec_index_exists
+
+
+def refresh_search_vectors(db: Session, slide_ids: Iterable[int]):
+    """Rebuild search_vector from the current title and shapes of the given slides (flushed, not committed)"""
+    slide_ids = list(slide_ids)
+    if not slide_ids or not supports_full_text_search(db):
+        return
+    db.flush()
+    db.execute(_REFRESH_SEARCH_VECTORS, {"config": TS_CONFIG, "ids": slide_ids})
+
+
+def _any_term_query(query_text: str):
+    """tsquery matching any of the terms of query_text (plainto_tsquery requires all of them)"""
+    return cast(func.replace(cast(func.plainto_tsquery(TS_CONFIG, query_text), String), "&", "|"), TSQUERY)
+
+
+def retrieve_candidates(
+    db: Session,
+    query_text: str,
+    query_embedding: List[float],
+    limit: int,
+    exclude_ids: Collection[int] = ()
+) -> List[SlideCandidate]:
+    """
+    Up to `limit` slides with the highest full-text rank plus up to `limit` slides
+    nearest to query_embedding, with both scores for each.
+    """
+    if not supports_full_text_search(db):
+        return _scan_candidates(db, query_embedding, exclude_ids)
+
+    tsquery = _any_term_query(query_text)
+    # Normalisation 32 maps the rank to rank / (rank + 1)
+    lexical_rank = func.coalesce(func.ts_rank_cd(SlideMetadata.search_vector, tsquery, 32), 0.0)
+    distance = SlideMetadata.embedding.cosine_distance(query_embedding)
+    first_stage_distance = distance
+    if halfvec_search_enabled(db):
+        first_stage_distance = cast(
+            SlideMetadata.embedding, HALFVEC(embedding_dimensions())
+        ).cosine_distance(query_embedding)
+        # HNSW returns at most ef_search rows per scan
+        db.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"), {"value": str(max(limit, 40))})
+
+    lexical_ids = (
+        select(SlideMetadata.id)
+        .where(SlideMetadata.search_vector.op("@@")(tsquery))
+        .order_by(lexical_rank.desc())
+        .limit(limit)
+    )
+    vector_ids = (
+        select(SlideMetadata.id)
+        .where(SlideMetadata.embedding.isnot(None))
+        .order_by(first_stage_distance)
+        .limit(limit)
+    )
+    if exclude_ids:
+        lexical_ids = lexical_ids.where(SlideMetadata.id.notin_(exclude_ids))
+        vector_ids = vector_ids.where(SlideMetadata.id.notin_(exclude_ids))
+
+    # Exact float32 similarity for every candidate, whichever precision selected it
+    rows = (
+        db.query(SlideMetadata, 1 - distance, lexical_rank)
+        .filter(SlideMetadata.id.in_(union(lexical_ids, vector_ids)))
+        .filter(SlideMetadata.embedding.isnot(None))
+        .all()
+    )
+    return [SlideCandidate(slide, float(similarity), float(rank)) for slide, similarity, rank in rows]
+
+
+def _scan_candidates(db: Session, query_embedding: List[float], exclude_ids: Collection[int]) -> List[SlideCandidate]:
+    """Fallback without Postgres full-text search: every slide, vector similarity only"""
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    candidates = []
+    for slide in db.query(SlideMetadata).all():
+        if slide.embedding is None or slide.id in exclude_ids:
+            continue
+        similarity = np.dot(query, slide.embedding) / (query_norm * np.linalg.norm(slide.embedding))
+        candidates.append(SlideCandidate(slide, float(similarity), 0.0))
+    return candidates
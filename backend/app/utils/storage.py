@@ -0,0 +1,236 @@
+import hashlib
+import hmac
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+from urllib.parse import quote, urlencode
+
+from app.config import settings
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    modified_at: float  # Unix timestamp
+
+
+class StorageBackend:
+    """
+    Interface for blob storage. Keys are slash-separated relative paths such as
+    "images/slide_<sha256>.jpg", which is also what the database stores.
+    """
+
+    def put_file(self, key: str, path: Path) -> None:
+        """Move a finished local file to the given key, atomically replacing any previous blob"""
+        raise NotImplementedError
+
+    def write_stream(self, key: str, stream: BinaryIO) -> None:
+        """Store a stream under the given key, in chunks"""
+        with spooled_file() as path:
+            with open(path, "wb") as f:
+                shutil.copyfileobj(stream, f, settings.UPLOAD_CHUNK_SIZE)
+            self.put_file(key, path)
+
+    def iter_read(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Stream the bytes of a blob in chunks, optionally restricted to the inclusive range [start, end]"""
+        raise NotImplementedError
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        """Return size and modification time of a blob, or None if it doesn't exist"""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        """List the blobs whose key starts with prefix"""
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, expires_in: int = 3600) -> str:
+        """A time-limited URL that can fetch the blob without further authentication"""
+        raise NotImplementedError
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[Path]:
+        """Yield a local filesystem path holding the blob, for libraries that need real files"""
+        with spooled_file(Path(key).suffix) as path:
+            with open(path, "wb") as f:
+                for chunk in self.iter_read(key):
+                    f.write(chunk)
+            yield path
+
+
+class LocalStorage(StorageBackend):
+    """Blobs stored as files below a root directory"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def put_file(self, key: str, path: Path) -> None:
+        target = self._path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(path, target)
+        except OSError:
+            # Different filesystem: copy next to the target first so the final rename stays atomic
+            fd, temp_path = tempfile.mkstemp(dir=target.parent, suffix=".part")
+            os.close(fd)
+            shutil.move(str(path), temp_path)
+            os.replace(temp_path, target)
+
+    def iter_read(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(settings.UPLOAD_CHUNK_SIZE if remaining is None else min(settings.UPLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            stat = self._path(key).stat()
+        except FileNotFoundError:
+            return None
+        return StoredObject(key=key, size=stat.st_size, modified_at=stat.st_mtime)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        directory = self._path(prefix)
+        if not directory.is_dir():
+            return
+        for path in directory.iterdir():
+            if path.is_file():
+                stat = path.stat()
+                yield StoredObject(key=path.relative_to(self.root).as_posix(), size=stat.st_size, modified_at=stat.st_mtime)
+
+    def presigned_url(self, key: str, expires_in: int = 3600) -> str:
+        expires = int(time.time()) + expires_in
+        query = urlencode({"expires": expires, "signature": sign_artifact_key(key, expires)})
+        return f"{settings.API_PREFIX}/artifacts/{quote(key)}?{query}"
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[Path]:
+        yield self._path(key)
+
+
+class S3Storage(StorageBackend):
+    """Blobs stored in an S3-compatible bucket (AWS S3, MinIO, ...)"""
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 access_key_id: Optional[str] = None, secret_access_key: Optional[str] = None):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("The S3 storage backend requires boto3 (pip install boto3)") from e
+
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+        )
+
+    def put_file(self, key: str, path: Path) -> None:
+        # upload_file switches to multipart uploads for large files; objects only become visible once complete
+        self.client.upload_file(str(path), self.bucket, key)
+        Path(path).unlink(missing_ok=True)
+
+    def write_stream(self, key: str, stream: BinaryIO) -> None:
+        self.client.upload_fileobj(stream, self.bucket, key)
+
+    def iter_read(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        params = {"Bucket": self.bucket, "Key": key}
+        if start or end is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+        body = self.client.get_object(**params)["Body"]
+        try:
+            yield from body.iter_chunks(settings.UPLOAD_CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(key=key, size=head["ContentLength"], modified_at=head["LastModified"].timestamp())
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix.rstrip("/") + "/"):
+            for item in page.get("Contents", []):
+                yield StoredObject(key=item["Key"], size=item["Size"], modified_at=item["LastModified"].timestamp())
+
+    def presigned_url(self, key: str, expires_in: int = 3600) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires_in,
+        )
+
+
+def sign_artifact_key(key: str, expires: int) -> str:
+    """HMAC signature used by the local backend's presigned-style URLs"""
+    message = f"{key}:{expires}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_artifact_signature(key: str, expires: int, signature: str) -> bool:
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_artifact_key(key, expires), signature)
+
+
+@contextmanager
+def spooled_file(suffix: str = "") -> Iterator[Path]:
+    """A local scratch file that is removed on exit unless it was moved away"""
+    fd, temp_path = tempfile.mkstemp(dir=settings.STORAGE_SCRATCH_DIR or None, suffix=suffix)
+    os.close(fd)
+    try:
+        yield Path(temp_path)
+    finally:
+        Path(temp_path).unlink(missing_ok=True)
+
+
+def _create_storage_backend() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.STORAGE_ROOT)
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+        )
+    raise ValueError("Invalid STORAGE_BACKEND. Must be 'local' or 's3'")
+
+
+storage = _create_storage_backend()
@@ -0,0 +1,124 @@
+"""
+Application logging: JSON records written from a background thread.
+
+Log calls on the request path only enqueue the LogRecord; message interpolation,
+JSON encoding and I/O happen in a QueueListener thread. Records carry the id of the
+request they were emitted for (see request_id_var). Large payloads go through
+log_payload, which skips them entirely unless debug logging is on or the call is sampled.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from app.config import settings
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _json_default(value: Any):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the request id and any extra= fields of the record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=_json_default)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text lines, followed by the JSON of the record's log_payload payload if it has one"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        if hasattr(record, "payload"):
+            line += " " + json.dumps(record.payload, default=_json_default)
+        return line
+
+
+class _RequestIdFilter(logging.Filter):
+    """Stamps records with the current request id while still in the emitting context"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The stock handler
+    interpolates the message before enqueueing, which is the work we want off the hot path.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging():
+    """Route all logging through a queue to JSON (or plain text) handlers; safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = settings.LOG_LEVEL or ("DEBUG" if settings.DEBUG else "INFO")
+    if settings.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter()
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if settings.LOG_FILE:
+        handlers.append(logging.FileHandler(settings.LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = _DeferredQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(_RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, level: int = logging.DEBUG):
+    """
+    Log a potentially large payload (inputs, outlines, generated content) under the
+    "payload" field. It is only logged when the logger is enabled for level, or at INFO
+    for a LOG_PAYLOAD_SAMPLE_RATE fraction of calls; it is serialized by the listener thread.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"payload": payload})
+    elif settings.LOG_PAYLOAD_SAMPLE_RATE and random.random() < settings.LOG_PAYLOAD_SAMPLE_RATE:
+        logger.info(message, extra={"payload": payload, "sampled": True})
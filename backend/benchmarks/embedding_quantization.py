@@ -0,0 +1,185 @@
+"""
+Recall, memory and latency of compact embedding representations for first-stage search.
+
+Compares exact float32 search with float16 (what pgvector's halfvec stores) and int8
+scalar quantization, each alone and followed by an exact float32 re-rank of the top
+k * oversample candidates, over a synthetic clustered embedding library:
+
+    python -m benchmarks.embedding_quantization --slides 20000 --k 10 --oversample 4
+
+With --database-url it also builds HNSW indexes on a scratch table in Postgres and
+reports their size, query latency and recall for vector (float32) and halfvec (needs
+pgvector >= 0.7), the latter re-ranked on the float32 column like slide matching does.
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict
+
+import numpy as np
+
+
+def synthetic_library(n_slides: int, dimensions: int, clusters: int, seed: int) -> np.ndarray:
+    """Unit vectors around a few centres, since slide libraries are clustered by topic"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n_slides)] + 0.6 * rng.standard_normal((n_slides, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_queries(library: np.ndarray, n_queries: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    noise = rng.standard_normal((n_queries, library.shape[1])).astype(np.float32) / np.sqrt(library.shape[1])
+    queries = library[rng.integers(0, len(library), n_queries)] + 0.5 * noise
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def recall(found: np.ndarray, exact: np.ndarray) -> float:
+    return len(set(found.tolist()) & set(exact.tolist())) / len(exact)
+
+
+def quantize_int8(library: np.ndarray):
+    scale = np.abs(library).max(axis=0) / 127
+    return np.round(library / scale).astype(np.int8), scale
+
+
+def _measure(search: Callable[[np.ndarray], np.ndarray], queries: np.ndarray, exact: list, k: int) -> Dict[str, float]:
+    recalls, latencies = [], []
+    for query, expected in zip(queries, exact):
+        start = time.perf_counter()
+        found = search(query)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(recall(found[:k], expected))
+    return {
+        f"recall@{k}": float(np.mean(recalls)),
+        "latency_ms_p50": float(np.percentile(latencies, 50) * 1000),
+        "latency_ms_p95": float(np.percentile(latencies, 95) * 1000),
+    }
+
+
+def in_process_report(library: np.ndarray, queries: np.ndarray, k: int, oversample: int) -> Dict[str, dict]:
+    exact = [top_k(library @ query, k) for query in queries]
+    half = library.astype(np.float16)
+    int8, scale = quantize_int8(library)
+    # Fold the per-dimension scale into the query so scores stay comparable. numpy has no
+    # int8 or float16 BLAS kernels and upcasts per query, so in-process latencies here
+    # overstate their cost; the resident matrix size is what these representations save.
+    int8_scores = lambda query: int8.astype(np.float32, copy=False) @ (query * scale)
+
+    def rerank(first_stage: Callable[[np.ndarray], np.ndarray]):
+        def search(query):
+            candidates = top_k(first_stage(query), k * oversample)
+            return candidates[top_k(library[candidates] @ query, k)]
+        return search
+
+    representations = {
+        "float32": (library.nbytes, lambda query: top_k(library @ query, k)),
+        "float16": (half.nbytes, lambda query: top_k(half @ query.astype(np.float16), k)),
+        "float16+rerank": (half.nbytes, rerank(lambda query: half @ query.astype(np.float16))),
+        "int8": (int8.nbytes + scale.nbytes, lambda query: top_k(int8_scores(query), k)),
+        "int8+rerank": (int8.nbytes + scale.nbytes, rerank(int8_scores)),
+    }
+    report = {}
+    for name, (nbytes, search) in representations.items():
+        report[name] = {
+            "matrix_bytes": int(nbytes),
+            "memory_vs_float32": nbytes / library.nbytes,
+            **_measure(search, queries, exact, k),
+        }
+    return report
+
+
+def database_report(database_url: str, library: np.ndarray, queries: np.ndarray, k: int, oversample: int) -> Dict[str, dict]:
+    """HNSW index size, latency and recall in Postgres for vector and halfvec"""
+    from sqlalchemy import create_engine, text
+
+    dimensions = library.shape[1]
+    exact = [top_k(library @ query, k) for query in queries]
+    engine = create_engine(database_url)
+    literal = lambda vector: "[" + ",".join(f"{value:.7g}" for value in vector) + "]"
+
+    with engine.connect() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        version = conn.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+        conn.execute(text("DROP TABLE IF EXISTS embedding_benchmark"))
+        conn.execute(text(f"CREATE TABLE embedding_benchmark (id integer PRIMARY KEY, embedding vector({dimensions}))"))
+        for offset in range(0, len(library), 1000):
+            conn.execute(
+                text("INSERT INTO embedding_benchmark (id, embedding) VALUES (:id, :embedding)"),
+                [{"id": offset + i, "embedding": literal(vector)} for i, vector in enumerate(library[offset:offset + 1000])]
+            )
+        conn.commit()
+
+        variants = {"vector": ("embedding", "vector_cosine_ops")}
+        if tuple(int(part) for part in version.split(".")[:2]) >= (0, 7):
+            variants["halfvec+rerank"] = (f"(embedding::halfvec({dimensions}))", "halfvec_cosine_ops")
+        else:
+            print(f"pgvector {version} has no halfvec, skipping it", file=sys.stderr)
+
+        report = {}
+        for name, (expression, opclass) in variants.items():
+            index = f"embedding_benchmark_{name.split('+')[0]}_idx"
+            conn.execute(text(f"CREATE INDEX {index} ON embedding_benchmark USING hnsw ({expression} {opclass})"))
+            conn.execute(text(f"SET hnsw.ef_search = {max(40, k * oversample)}"))
+            limit = k * oversample if "rerank" in name else k
+            cast = f"::halfvec({dimensions})" if "halfvec" in name else ""
+
+            def search(query):
+                # First stage on the index, then exact float32 order of its candidates
+                rows = conn.execute(text(f"""
+                    SELECT id FROM (
+                        SELECT id, embedding FROM embedding_benchmark
+                        ORDER BY {expression} <=> CAST(:query AS vector){cast} LIMIT :limit
+                    ) candidates
+                    ORDER BY embedding <=> CAST(:query AS vector) LIMIT :k
+                """), {"query": literal(query), "limit": limit, "k": k}).all()
+                return np.array([row[0] for row in rows])
+
+            report[name] = {
+                "index_bytes": conn.execute(text(f"SELECT pg_relation_size('{index}')")).scalar(),
+                **_measure(search, queries, exact, k),
+            }
+            conn.execute(text(f"DROP INDEX {index}"))
+        conn.execute(text("DROP TABLE embedding_benchmark"))
+        conn.commit()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversample", type=int, default=4, help="Re-rank k * oversample first-stage candidates")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", help="Also benchmark HNSW indexes in this Postgres database")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    library = synthetic_library(args.slides, args.dimensions, args.clusters, args.seed)
+    queries = synthetic_queries(library, args.queries, args.seed)
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("database_url", "output")},
+        "in_process": in_process_report(library, queries, args.k, args.oversample),
+    }
+    if args.database_url:
+        report["postgres"] = database_report(args.database_url, library, queries, args.k, args.oversample)
+
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+
+
+if __name__ == "__main__":
+    main()
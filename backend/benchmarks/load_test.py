@@ -0,0 +1,221 @@
+"""
+Load driver for /repository/upload and /completions/generate-presentation.
+
+Runs a mix of upload and generate requests at a fixed concurrency against a running
+API and reports throughput, latency percentiles and error rates per operation. In
+parallel it probes GET /health, whose latency approximates how long the server's event
+loop is blocked (by the sync DB session, sync LLM calls or LibreOffice) between awaits.
+
+Start the API against the fake LLM, e.g. with docker compose:
+
+    FAKE_LLM_LATENCY_MS=300 docker compose --profile loadtest up -d
+    # with LLM_PROVIDER=fake and FAKE_LLM_BASE_URL=http://fake-llm:8100/v1 in backend/.env
+
+then from the backend directory:
+
+    python -m benchmarks.load_test --concurrency 16 --duration 120 --mix generate=4,upload=1
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.synthetic_deck import generate_deck
+
+PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+INDUSTRIES = ["healthcare", "retail", "banking", "energy", "logistics", "education"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "p50_s": percentile(samples, 50),
+        "p95_s": percentile(samples, 95),
+        "p99_s": percentile(samples, 99),
+        "max_s": max(samples, default=0.0),
+        "mean_s": statistics.fmean(samples) if samples else 0.0,
+    }
+
+
+def _deck_bytes(slides: int, seed: int) -> bytes:
+    stream = io.BytesIO()
+    generate_deck(slides, seed=seed).save(stream)
+    return stream.getvalue()
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.api = args.base_url.rstrip("/") + args.api_prefix
+        self.rng = random.Random(args.seed)
+        self.decks = [_deck_bytes(args.deck_slides, args.seed + i) for i in range(args.deck_pool)]
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self.server_lag: List[float] = []
+        self.client_lag: List[float] = []
+        self.sequence = 0
+
+    def _presentation_input(self) -> dict:
+        # Unique requests defeat the result cache unless a repeat is drawn on purpose
+        self.sequence += 1
+        variant = 0 if self.rng.random() < self.args.repeat_ratio else self.sequence
+        return {
+            "title": f"Load test deck {variant}",
+            "client_name": f"Client {variant}",
+            "industry": INDUSTRIES[variant % len(INDUSTRIES)],
+            "description": "Proposal for a platform modernisation engagement",
+            "target_audience": "executives",
+            "key_messages": ["faster delivery", "lower cost", "proven team"],
+            "num_slides": self.args.num_slides,
+        }
+
+    async def _upload(self, client: httpx.AsyncClient) -> httpx.Response:
+        files = {"file": ("deck.pptx", self.rng.choice(self.decks), PPTX_MEDIA_TYPE)}
+        return await client.post(f"{self.api}/repository/upload", files=files, data={"title": "Load test library"})
+
+    async def _generate(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.post(f"{self.api}/completions/generate-presentation", json=self._presentation_input())
+
+    async def _request(self, client: httpx.AsyncClient, operation: str):
+        start = time.perf_counter()
+        try:
+            response = await (self._upload(client) if operation == "upload" else self._generate(client))
+            outcome = str(response.status_code)
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        self.latencies[operation].append(time.perf_counter() - start)
+        self.outcomes[operation][outcome] += 1
+
+    async def _worker(self, client: httpx.AsyncClient, deadline: float, operations: List[str], weights: List[float]):
+        while time.perf_counter() < deadline and (
+            self.args.requests is None or sum(map(len, self.latencies.values())) < self.args.requests
+        ):
+            await self._request(client, self.rng.choices(operations, weights)[0])
+
+    async def _sample_lag(self, client: httpx.AsyncClient, stop: asyncio.Event):
+        interval = self.args.lag_interval
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                await client.get(f"{self.args.base_url.rstrip('/')}/health")
+                self.server_lag.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                pass
+            # The driver's own loop lag, to tell a saturated client from a saturated server
+            before_sleep = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.client_lag.append(max(0.0, time.perf_counter() - before_sleep - interval))
+
+    async def run(self) -> dict:
+        args = self.args
+        mix = {op: float(w) for op, _, w in (part.partition("=") for part in args.mix.split(","))}
+        operations, weights = list(mix), list(mix.values())
+        limits = httpx.Limits(max_connections=args.concurrency + 1)
+
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client, \
+                httpx.AsyncClient(timeout=args.timeout) as probe_client:
+            # Generation needs slides to match against
+            for _ in range(args.warmup_uploads):
+                response = await self._upload(client)
+                response.raise_for_status()
+
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(self._sample_lag(probe_client, stop))
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*(
+                self._worker(client, deadline, operations, weights) for _ in range(args.concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await sampler
+
+        operations_report = {}
+        for operation, samples in self.latencies.items():
+            outcomes = self.outcomes[operation]
+            errors = sum(count for outcome, count in outcomes.items() if not outcome.startswith("2"))
+            operations_report[operation] = {
+                "requests": len(samples),
+                "throughput_rps": len(samples) / elapsed,
+                "error_rate": errors / len(samples),
+                "outcomes": dict(outcomes),
+                **summarize(samples),
+            }
+
+        total = sum(map(len, self.latencies.values()))
+        return {
+            "config": {
+                "base_url": args.base_url,
+                "concurrency": args.concurrency,
+                "mix": mix,
+                "deck_slides": args.deck_slides,
+                "repeat_ratio": args.repeat_ratio,
+                "seed": args.seed,
+            },
+            "elapsed_s": elapsed,
+            "requests": total,
+            "throughput_rps": total / elapsed,
+            "operations": operations_report,
+            "server_event_loop_lag": {"samples": len(self.server_lag), **summarize(self.server_lag)},
+            "client_event_loop_lag": {"samples": len(self.client_lag), **summarize(self.client_lag)},
+        }
+
+
+def _print_summary(report: dict):
+    print(f"{report['requests']} requests in {report['elapsed_s']:.1f}s "
+          f"({report['throughput_rps']:.2f} req/s)", file=sys.stderr)
+    for operation, stats in report["operations"].items():
+        print(f"  {operation:<10} n={stats['requests']:<5} {stats['throughput_rps']:.2f} req/s  "
+              f"p50={stats['p50_s']:.3f}s p95={stats['p95_s']:.3f}s p99={stats['p99_s']:.3f}s  "
+              f"errors={stats['error_rate']:.1%}", file=sys.stderr)
+    lag = report["server_event_loop_lag"]
+    print(f"  /health    p50={lag['p50_s']:.3f}s p99={lag['p99_s']:.3f}s max={lag['max_s']:.3f}s", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--api-prefix", default="/api/v1")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at any time")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to generate load for")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests, even before --duration")
+    parser.add_argument("--mix", default="generate=4,upload=1", help="Relative weights of generate and upload requests")
+    parser.add_argument("--deck-slides", type=int, default=12, help="Slides in each uploaded synthetic deck")
+    parser.add_argument("--deck-pool", type=int, default=4, help="Distinct synthetic decks to upload")
+    parser.add_argument("--warmup-uploads", type=int, default=1, help="Uploads done before the measured run")
+    parser.add_argument("--num-slides", type=int, default=6, help="num_slides requested from generation")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="Fraction of generate requests repeating an earlier request (result cache hits)")
+    parser.add_argument("--lag-interval", type=float, default=0.1, help="Seconds between /health probes")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(LoadTest(args).run())
+    _print_summary(report)
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+
+
+if __name__ == "__main__":
+    main()
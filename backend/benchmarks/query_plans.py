@@ -0,0 +1,144 @@
+"""
+Checks that the hot repository queries are served by their indexes at scale.
+
+Run from the backend directory against a database migrated to head:
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --presentations 1000 --slides-per-deck 40 --shapes-per-slide 12
+
+A synthetic library is inserted in a transaction and analysed, each query is EXPLAINed
+and the transaction is rolled back, so the database is left as it was. The run exits
+non-zero when a query does not scan its expected index or falls back to a sequential
+scan of its table, e.g. after a migration dropped or changed an index.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, List
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.engine import Connection
+
+from app.config import settings
+from app.models.models import SlideMetadata, SlideShape
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+def seed(conn: Connection, presentations: int, slides_per_deck: int, shapes_per_slide: int) -> Dict[str, object]:
+    """Insert the synthetic library and return ids to query for, from the middle of it"""
+    presentation_ids = conn.execute(text("""
+        INSERT INTO presentations (title, number_of_slides)
+        SELECT 'Query plan check ' || n, :slides FROM generate_series(1, :presentations) n
+        RETURNING id
+    """), {"presentations": presentations, "slides": slides_per_deck}).scalars().all()
+    conn.execute(text("""
+        INSERT INTO slide_metadata (presentation_id, slide_number, title, category)
+        SELECT p, n, 'Slide ' || n, 'agenda' FROM unnest(CAST(:ids AS integer[])) p, generate_series(1, :slides) n
+    """), {"ids": presentation_ids, "slides": slides_per_deck})
+    conn.execute(text("""
+        INSERT INTO slide_shapes (slide_metadata_id, shape_index, shape_type, text_content)
+        SELECT s.id, n, 'TEXT_BOX', 'Shape ' || n
+        FROM slide_metadata s, generate_series(1, :shapes) n
+        WHERE s.presentation_id = ANY(CAST(:ids AS integer[]))
+    """), {"ids": presentation_ids, "shapes": shapes_per_slide})
+    conn.execute(text("ANALYZE presentations, slide_metadata, slide_shapes"))
+
+    presentation_id = presentation_ids[len(presentation_ids) // 2]
+    slide_ids = conn.execute(
+        select(SlideMetadata.id).where(SlideMetadata.presentation_id == presentation_id).order_by(SlideMetadata.slide_number)
+    ).scalars().all()
+    return {"presentation_id": presentation_id, "slide_ids": slide_ids}
+
+
+def hot_queries(ids: Dict[str, object]) -> Dict[str, tuple]:
+    """Name -> (statement, table, index it must scan), mirroring the application's queries"""
+    presentation_id, slide_ids = ids["presentation_id"], ids["slide_ids"]
+    shapes_index = "ix_slide_shapes_slide_metadata_id_shape_index"
+    return {
+        # generation_pipeline._slide_texts, once per matched slide
+        "shape texts of a slide": (
+            select(SlideShape.text_content)
+            .where(SlideShape.slide_metadata_id == slide_ids[0])
+            .order_by(SlideShape.shape_index),
+            "slide_shapes", shapes_index,
+        ),
+        # Shapes of several matched slides at once, and relationship loads
+        "shapes of a set of slides": (
+            select(SlideShape).where(SlideShape.slide_metadata_id.in_(slide_ids[:10])),
+            "slide_shapes", shapes_index,
+        ),
+        # GET /slides?presentation_id=...
+        "slides of a presentation": (
+            select(SlideMetadata.id, SlideMetadata.title)
+            .where(SlideMetadata.presentation_id == presentation_id)
+            .order_by(SlideMetadata.id),
+            "slide_metadata", "ix_slide_metadata_presentation_id",
+        ),
+        # slide_rendering.render_slides
+        "slides to render": (
+            select(SlideMetadata.id, SlideMetadata.image_path)
+            .where(SlideMetadata.presentation_id == presentation_id, SlideMetadata.slide_number.in_([1, 2, 3])),
+            "slide_metadata", "ix_slide_metadata_presentation_id",
+        ),
+    }
+
+
+def _plan_nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def check_plan(conn: Connection, statement, table: str, index: str) -> Dict[str, object]:
+    compiled = statement.compile(conn, compile_kwargs={"literal_binds": True})
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()[0]["Plan"]
+    nodes = list(_plan_nodes(plan))
+    scans = [f"{node['Node Type']} on {node.get('Index Name') or node.get('Relation Name')}"
+             for node in nodes if "Scan" in node["Node Type"]]
+    uses_index = any(node["Node Type"] in INDEX_SCANS and node.get("Index Name") == index for node in nodes)
+    seq_scan = any(node["Node Type"] == "Seq Scan" and node.get("Relation Name") == table for node in nodes)
+    return {"ok": uses_index and not seq_scan, "expected_index": index, "scans": scans, "total_cost": plan["Total Cost"]}
+
+
+def run(args) -> Dict[str, object]:
+    engine = create_engine(args.database_url)
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            ids = seed(conn, args.presentations, args.slides_per_deck, args.shapes_per_slide)
+            return {
+                name: check_plan(conn, statement, table, index)
+                for name, (statement, table, index) in hot_queries(ids).items()
+            }
+        finally:
+            transaction.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.DATABASE_URI)
+    parser.add_argument("--presentations", type=int, default=500)
+    parser.add_argument("--slides-per-deck", type=int, default=40)
+    parser.add_argument("--shapes-per-slide", type=int, default=8)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+
+    failures: List[str] = [
+        f"{name}: expected {result['expected_index']}, got {', '.join(result['scans'])}"
+        for name, result in report.items() if not result["ok"]
+    ]
+    if failures:
+        print("Queries not using their index:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
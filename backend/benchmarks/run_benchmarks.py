@@ -0,0 +1,269 @@
+"""
+Reproducible benchmarks for the ingestion, matching and construction hot paths.
+
+Run from the backend directory:
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baselines/default.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baselines/default.json
+
+With --baseline the run exits non-zero when a benchmark's median is slower than the
+baseline by more than --tolerance. No database or OpenAI access is needed: decks are
+generated with python-pptx, blobs go to a temporary local storage root, matching runs
+against in-memory SlideMetadata rows and embeddings are derived from a hash of the text.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Must be configured before the app modules read their settings
+WORKDIR = tempfile.mkdtemp(prefix="benchmarks_")
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("STORAGE_ROOT", WORKDIR)
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import numpy as np
+import pptx
+from pptx import Presentation
+
+from app.models.models import SlideMetadata
+from app.schemas import schemas
+from app.utils import pptx_construction
+from app.utils.artifact_store import store_file
+from app.utils.fake_openai import hash_embedding
+from app.utils.pptx_parsing import (
+    CONTENT_MAPPING_PROFILES,
+    _create_content_mapping,
+    _extract_slide_title,
+    _generate_slide_tags,
+    _infer_slide_category,
+    _infer_slide_purpose,
+    _infer_slide_type,
+    retrieve_shape_and_content,
+)
+from app.utils.storage import storage
+from benchmarks.synthetic_deck import generate_deck, parse_mix
+
+CATEGORIES = ["content", "data_visualization", "data_presentation", "visual", "timeline", "introduction"]
+
+
+class InMemorySession:
+    """The slice of the SQLAlchemy Session API find_matching_slides_remix uses, backed by a list"""
+
+    def __init__(self, slides: List[SlideMetadata]):
+        self.slides = slides
+
+    def get_bind(self):
+        return None  # No Postgres, so matching takes the in-memory scan path
+
+    def query(self, *entities):
+        return self
+
+    def all(self):
+        return self.slides
+
+
+def _time(fn: Callable[[], object], repeats: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "max_s": max(samples),
+        "repeats": repeats,
+    }
+
+
+def _store_deck(prs: Presentation) -> str:
+    path = Path(WORKDIR) / f"deck_{time.time_ns()}.pptx"
+    prs.save(path)
+    return store_file("decks", path, prefix="presentation_", suffix=".pptx")
+
+
+def bench_analysis(deck_key: str, repeats: int) -> Dict[str, Dict[str, float]]:
+    """Per-slide analysis done by process_powerpoint_repository (heuristics and content mapping)"""
+    with storage.local_copy(deck_key) as path:
+        slides = list(Presentation(path).slides)
+
+    def heuristics():
+        for slide in slides:
+            _extract_slide_title(slide)
+            _infer_slide_purpose(slide)
+            _infer_slide_category(slide)
+            _infer_slide_type(slide)
+            _generate_slide_tags(slide)
+
+    results = {"parse.heuristics": _time(heuristics, repeats)}
+    for profile in CONTENT_MAPPING_PROFILES:
+        def content_mapping():
+            return [_create_content_mapping(slide, profile) for slide in slides]
+
+        timing = _time(content_mapping, repeats)
+        # What each profile costs in the content_mapping column
+        timing["json_bytes_per_slide"] = len(json.dumps(content_mapping())) / len(slides)
+        results[f"parse.content_mapping.{profile}"] = timing
+    return results
+
+
+def bench_retrieve_shapes(deck_key: str, repeats: int) -> Dict[str, float]:
+    return _time(lambda: retrieve_shape_and_content(deck_key), repeats)
+
+
+def bench_matching(n_slides: int, sections: int, dimensions: int, repeats: int) -> Dict[str, float]:
+    rng = np.random.default_rng(n_slides)
+    slides = []
+    for i in range(n_slides):
+        vector = rng.standard_normal(dimensions).astype(np.float32)
+        slides.append(SlideMetadata(
+            id=i + 1,
+            slide_number=i + 1,
+            category=CATEGORIES[i % len(CATEGORIES)],
+            embedding=vector / np.linalg.norm(vector),
+        ))
+    outline = [
+        schemas.SlideOutline(
+            slide_number=i + 1,
+            section=CATEGORIES[i % len(CATEGORIES)],
+            description=f"Synthetic outline section {i}",
+            keywords=["benchmark", str(i)],
+        )
+        for i in range(sections)
+    ]
+    db = InMemorySession(slides)
+
+    def run():
+        # Threshold -1 so every section matches and the full scan is always measured
+        asyncio.run(pptx_construction.find_matching_slides_remix(outline, db, similarity_threshold=-1))
+
+    return _time(run, repeats)
+
+
+def bench_construction(deck_key: str, slides_to_keep: int, repeats: int) -> Dict[str, float]:
+    shapes = retrieve_shape_and_content(deck_key)
+    rng = random.Random(0)
+    kept = sorted(rng.sample(sorted({shape.slide_metadata_id for shape in shapes}), slides_to_keep))
+    replacements = [
+        {
+            "slide_id": slide_number,
+            "content": {
+                shape.text_content: shape.text_content.upper()
+                for shape in shapes
+                if shape.slide_metadata_id == slide_number and shape.text_content
+            },
+        }
+        for slide_number in kept
+    ]
+    return _time(lambda: pptx_construction.copyOG_remix_remix(deck_key, replacements), repeats)
+
+
+def run(args) -> Dict[str, object]:
+    async def fake_embedding(text: str) -> List[float]:
+        return hash_embedding(text, args.embedding_dimensions)
+
+    pptx_construction.get_embedding = fake_embedding
+
+    mix = parse_mix(args.mix)
+    deck_key = _store_deck(generate_deck(args.deck_slides, mix, seed=args.seed))
+    results = {}
+
+    print(f"Analysing a {args.deck_slides}-slide deck...", file=sys.stderr)
+    results.update({
+        f"{name}[slides={args.deck_slides}]": timing
+        for name, timing in bench_analysis(deck_key, args.repeats).items()
+    })
+    results[f"parse.retrieve_shape_and_content[slides={args.deck_slides}]"] = bench_retrieve_shapes(deck_key, args.repeats)
+
+    for n_slides in args.match_sizes:
+        print(f"Matching {args.sections} sections against {n_slides} slides...", file=sys.stderr)
+        results[f"match.find_matching_slides_remix[slides={n_slides}]"] = bench_matching(
+            n_slides, args.sections, args.embedding_dimensions, args.repeats
+        )
+
+    print(f"Constructing a {args.keep}-slide presentation...", file=sys.stderr)
+    results[f"construct.copyOG_remix_remix[slides={args.deck_slides},keep={args.keep}]"] = bench_construction(
+        deck_key, min(args.keep, args.deck_slides), args.repeats
+    )
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "python_pptx": pptx.__version__,
+            "numpy": np.__version__,
+        },
+        "config": {
+            "deck_slides": args.deck_slides,
+            "mix": mix,
+            "seed": args.seed,
+            "sections": args.sections,
+            "embedding_dimensions": args.embedding_dimensions,
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, object], baseline: Dict[str, object], tolerance: float) -> List[str]:
+    """Return a description of every benchmark whose median regressed beyond the tolerance"""
+    regressions = []
+    for name, timing in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = timing["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        status = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        print(f"{status:>10}  {ratio:6.2f}x  {name}", file=sys.stderr)
+        if status != "ok":
+            regressions.append(f"{name}: {base['median_s']:.4f}s -> {timing['median_s']:.4f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deck-slides", type=int, default=60, help="Slides in the synthetic deck")
+    parser.add_argument("--mix", default="text=4,table=2,chart=2,picture=2", help="Relative weights of slide kinds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--match-sizes", type=lambda v: [int(n) for n in v.split(",")], default=[1000, 10000],
+                        help="Comma-separated library sizes for the matching benchmark, e.g. 1000,10000,100000")
+    parser.add_argument("--sections", type=int, default=8, help="Outline sections to match")
+    parser.add_argument("--embedding-dimensions", type=int, default=1536)
+    parser.add_argument("--keep", type=int, default=10, help="Slides kept by the construction benchmark")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--save-baseline", help="Write the JSON report as a baseline")
+    parser.add_argument("--baseline", help="Compare against this baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a regression, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    # Keep stdout for the JSON report, the app's own print calls are discarded
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = run(args)
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    for path in filter(None, [args.output, args.save_baseline]):
+        Path(path).write_text(rendered + "\n")
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
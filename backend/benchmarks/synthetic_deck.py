@@ -0,0 +1,121 @@
+"""
+Generate synthetic PowerPoint decks of configurable size and content mix for benchmarks.
+
+    python -m benchmarks.synthetic_deck --slides 200 --mix text=4,table=2,chart=2,picture=2 -o deck.pptx
+"""
+import argparse
+import io
+import random
+from typing import Dict
+
+from PIL import Image
+from pptx import Presentation
+from pptx.chart.data import CategoryChartData
+from pptx.enum.chart import XL_CHART_TYPE
+from pptx.util import Inches
+
+DEFAULT_MIX = {"text": 4, "table": 2, "chart": 2, "picture": 2}
+
+WORDS = (
+    "strategy growth platform customer revenue roadmap migration cloud delivery "
+    "timeline discovery pilot adoption security analytics integration outcome "
+    "velocity quality scale partnership investment efficiency insight"
+).split()
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse "text=4,table=2" into relative weights"""
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"Unknown slide kind {kind!r}, expected one of {sorted(DEFAULT_MIX)}")
+        weights[kind] = float(weight or 1)
+    return weights
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _picture(rng: random.Random) -> io.BytesIO:
+    image = Image.new("RGB", (320, 200), tuple(rng.randrange(256) for _ in range(3)))
+    stream = io.BytesIO()
+    image.save(stream, "PNG")
+    stream.seek(0)
+    return stream
+
+
+def _add_text_slide(prs, rng):
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = _sentence(rng, 4)
+    body = slide.placeholders[1].text_frame
+    body.text = _sentence(rng, 10)
+    for _ in range(rng.randint(2, 5)):
+        body.add_paragraph().text = _sentence(rng, rng.randint(6, 14))
+
+
+def _add_table_slide(prs, rng):
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = _sentence(rng, 3)
+    rows, cols = rng.randint(3, 8), rng.randint(2, 5)
+    table = slide.shapes.add_table(rows, cols, Inches(0.5), Inches(1.5), Inches(9), Inches(4)).table
+    for r in range(rows):
+        for c in range(cols):
+            table.cell(r, c).text = _sentence(rng, 2) if r == 0 else str(rng.randint(0, 10_000))
+
+
+def _add_chart_slide(prs, rng):
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = _sentence(rng, 3)
+    chart_data = CategoryChartData()
+    chart_data.categories = [f"Q{i + 1}" for i in range(rng.randint(4, 12))]
+    for s in range(rng.randint(1, 4)):
+        chart_data.add_series(f"Series {s + 1}", [rng.uniform(0, 100) for _ in chart_data.categories])
+    slide.shapes.add_chart(
+        rng.choice([XL_CHART_TYPE.COLUMN_CLUSTERED, XL_CHART_TYPE.LINE, XL_CHART_TYPE.BAR_CLUSTERED]),
+        Inches(0.5), Inches(1.5), Inches(9), Inches(5), chart_data
+    )
+
+
+def _add_picture_slide(prs, rng):
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = _sentence(rng, 3)
+    for i in range(rng.randint(1, 3)):
+        slide.shapes.add_picture(_picture(rng), Inches(0.5 + 3 * i), Inches(2), Inches(2.8))
+
+
+BUILDERS = {
+    "text": _add_text_slide,
+    "table": _add_table_slide,
+    "chart": _add_chart_slide,
+    "picture": _add_picture_slide,
+}
+
+
+def generate_deck(n_slides: int, mix: Dict[str, float] = None, seed: int = 0) -> Presentation:
+    """Build a deck of n_slides whose slide kinds are drawn from the mix weights, reproducibly for a seed"""
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    prs = Presentation()
+    for _ in range(n_slides):
+        BUILDERS[rng.choices(kinds, weights)[0]](prs, rng)
+    return prs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, default=50)
+    parser.add_argument("--mix", default="text=4,table=2,chart=2,picture=2")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="synthetic_deck.pptx")
+    args = parser.parse_args()
+
+    generate_deck(args.slides, parse_mix(args.mix), args.seed).save(args.output)
+    print(f"Wrote {args.slides} slides to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
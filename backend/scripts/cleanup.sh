@@ -1,5 +1,11 @@
 #!/bin/bash
-rm -rf /app/slides_repository/*
-rm -rf /app/presentation_output/*
-rm -rf /app/images/*
-rm -rf /app/logs/* 
\ No newline at end of file
+# Remove unreferenced decks/images and expired outputs from the artifact store.
+# Pass --all to wipe every stored artifact instead (destroys working data).
+if [ "$1" = "--all" ]; then
+    rm -rf /app/slides_repository/*
+    rm -rf /app/presentation_output/*
+    rm -rf /app/images/*
+    rm -rf /app/logs/*
+else
+    cd /app && python -m app.utils.artifact_store
+fi